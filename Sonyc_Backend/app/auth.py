@@ -4,9 +4,11 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import event
 from sqlalchemy.orm import Session
-from .database import get_db
+from .database import SessionLocal, ReadSessionLocal, READ_REPLICA_ENABLED
 from .models import User
+from .query_cache import LRUCache
 import os
 import logging
 from dotenv import load_dotenv
@@ -16,52 +18,43 @@ load_dotenv()
 # Setup logging
 logger = logging.getLogger(__name__)
 
-import bcrypt
-import hashlib
-import base64
+import time
+import ipaddress
+import threading
+from collections import OrderedDict, deque
 
-# Password hashing - using direct bcrypt with SHA-256 pre-hashing
+# Password hashing - using direct bcrypt with SHA-256 pre-hashing, on a process pool (see passwords.py)
 # Removed passlib/pwd_context due to compatibility issues
+from .passwords import verify_password, get_password_hash, hash_password, check_password, needs_rehash
 
 # JWT settings
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60  # 30 days
 
-# HTTP Bearer scheme for token extraction
-security = HTTPBearer(auto_error=False)
+# Authenticated user cache (USER_CACHE_TTL_SECONDS=0 disables it)
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+# Let get_token_user trust the id and email signed into the token instead of loading the user.
+# A deleted account then stays usable until its token expires, so this is off by default.
+JWT_TRUST_CLAIMS = os.getenv("JWT_TRUST_CLAIMS", "false").lower() == "true"
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against its hash using direct bcrypt + SHA256 pre-hash"""
-    # 1. SHA256 Pre-hash to ensure fixed length input to bcrypt
-    m = hashlib.sha256()
-    m.update(plain_password.encode('utf-8'))
-    sha_bytes = m.digest()
-    # 2. Base64 encode (to get safe bytes for bcrypt, keep as bytes)
-    pwd_bytes = base64.b64encode(sha_bytes)
-    
-    # 3. Verify
-    try:
-        return bcrypt.checkpw(pwd_bytes, hashed_password.encode('utf-8'))
-    except Exception as e:
-        logger.error(f"Error verifying password: {e}")
-        return False
-
-
-def get_password_hash(password: str) -> str:
-    """Hash a password using direct bcrypt + SHA256 pre-hash"""
-    # 1. SHA256 Pre-hash
-    m = hashlib.sha256()
-    m.update(password.encode('utf-8'))
-    sha_bytes = m.digest()
-    # 2. Base64 encode
-    pwd_bytes = base64.b64encode(sha_bytes)
-    
-    # 3. Hash
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(pwd_bytes, salt)
-    return hashed.decode('utf-8')
+# Login throttling: checked before any bcrypt work is done
+LOGIN_WINDOW_SECONDS = float(os.getenv("LOGIN_WINDOW_SECONDS", "300"))
+LOGIN_MAX_FAILURES_PER_USER = int(os.getenv("LOGIN_MAX_FAILURES_PER_USER", "5"))
+LOGIN_MAX_ATTEMPTS_PER_IP = int(os.getenv("LOGIN_MAX_ATTEMPTS_PER_IP", "30"))
+# Keys (emails and IPs) tracked at once; the least recently seen are forgotten first
+LOGIN_THROTTLE_MAX_KEYS = 100000
+# Reverse proxies (comma-separated IPs or CIDRs) whose X-Forwarded-For is believed when
+# keying the IP throttle; behind a proxy without this, every client shares the proxy's address
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(proxy.strip(), strict=False)
+    for proxy in os.getenv("TRUSTED_PROXIES", "").split(",")
+    if proxy.strip()
+]
 
+# HTTP Bearer scheme for token extraction
+security = HTTPBearer(auto_error=False)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token"""
@@ -75,6 +68,113 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
+class LoginThrottle:
+    """Sliding-window counters of recent events per key (an email or a client IP)"""
+
+    def __init__(self, window_seconds: float = LOGIN_WINDOW_SECONDS, max_keys: int = LOGIN_THROTTLE_MAX_KEYS):
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self._events: OrderedDict[str, deque] = OrderedDict()
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def _recent(self, key: str, now: float) -> Optional[deque]:
+        events = self._events.get(key)
+        if events is None:
+            return None
+        while events and now - events[0] > self.window_seconds:
+            events.popleft()
+        if not events:
+            del self._events[key]
+            return None
+        return events
+
+    def retry_after(self, key: str, limit: int) -> Optional[int]:
+        """Seconds until key drops below limit, or None if it is under it now"""
+        with self._lock:
+            now = time.monotonic()
+            events = self._recent(key, now)
+            if events is None or len(events) < limit:
+                return None
+            self.rejected += 1
+            return max(1, int(self.window_seconds - (now - events[-limit])) + 1)
+
+    def record(self, key: str):
+        with self._lock:
+            now = time.monotonic()
+            events = self._recent(key, now)
+            if events is None:
+                events = self._events[key] = deque()
+            events.append(now)
+            self._events.move_to_end(key)
+            while len(self._events) > self.max_keys:
+                self._events.popitem(last=False)
+
+    def reset(self, key: str):
+        with self._lock:
+            self._events.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"tracked_keys": len(self._events), "rejected": self.rejected}
+
+
+login_failures = LoginThrottle()
+login_attempts = LoginThrottle()
+
+
+def is_trusted_proxy(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in TRUSTED_PROXIES)
+
+
+def client_ip(request: Request) -> str:
+    """Address of the client, taken from X-Forwarded-For only when the request came through a trusted proxy.
+
+    The header is read right to left, skipping trusted proxies, so a client
+    cannot pick its own throttle key by sending a forged X-Forwarded-For.
+    """
+    host = request.client.host if request.client else "unknown"
+    if not is_trusted_proxy(host):
+        return host
+    forwarded = [hop.strip() for hop in ",".join(request.headers.getlist("x-forwarded-for")).split(",") if hop.strip()]
+    for hop in reversed(forwarded):
+        if not is_trusted_proxy(hop):
+            return hop
+    return forwarded[0] if forwarded else host
+
+
+def check_login_throttle(request: Request, email: Optional[str] = None):
+    """Raise 429 if this client IP, or this account, has had too many recent attempts; counts the attempt otherwise"""
+    ip_key = f"ip:{client_ip(request)}"
+    retry_after = login_attempts.retry_after(ip_key, LOGIN_MAX_ATTEMPTS_PER_IP)
+    if retry_after is None and email is not None:
+        retry_after = login_failures.retry_after(f"user:{email.lower()}", LOGIN_MAX_FAILURES_PER_USER)
+    if retry_after is not None:
+        logger.warning(f"Throttled authentication attempt from {ip_key}{f' for {email}' if email else ''}")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, try again later",
+            headers={"Retry-After": str(retry_after)},
+        )
+    login_attempts.record(ip_key)
+
+
+def record_login_failure(email: str):
+    login_failures.record(f"user:{email.lower()}")
+
+
+def record_login_success(email: str):
+    login_failures.reset(f"user:{email.lower()}")
+
+
+def get_login_throttle_stats() -> dict:
+    return {"failures": login_failures.stats(), "attempts": login_attempts.stats()}
+
+
 def extract_token_from_header(request: Request) -> Optional[str]:
     """Manually extract token from Authorization header as fallback"""
     authorization = request.headers.get("Authorization")
@@ -90,17 +190,64 @@ def extract_token_from_header(request: Request) -> Optional[str]:
         return None
 
 
-def get_current_user(
-    request: Request,
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get current authenticated user from JWT token"""
-    credentials_exception = HTTPException(
+def load_user(user_id: int) -> Optional[User]:
+    """Look a user up in a short-lived session, so no connection stays checked out for the rest of the request.
+
+    Goes to the read replica when one is configured, falling back to the
+    primary for accounts created too recently to have replicated.
+    """
+    with ReadSessionLocal() as db:
+        user = db.query(User).filter(User.id == user_id).first()
+    if user is None and READ_REPLICA_ENABLED:
+        with SessionLocal() as db:
+            user = db.query(User).filter(User.id == user_id).first()
+    return user
+
+
+# user id -> detached User; only found users are cached, so new accounts are never shadowed
+user_cache = LRUCache(USER_CACHE_MAX_ENTRIES, ttl_seconds=USER_CACHE_TTL_SECONDS) if USER_CACHE_TTL_SECONDS > 0 else None
+
+
+def get_user(user_id: int) -> Optional[User]:
+    """A user by id, from the cache when possible"""
+    if user_cache is not None:
+        user = user_cache.get(user_id)
+        if user is not None:
+            return user
+    user = load_user(user_id)
+    if user is not None and user_cache is not None:
+        user_cache.put(user_id, user)
+    return user
+
+
+def invalidate_user(user_id: int):
+    """Drop a user from this worker's cache after changing or deleting it; other workers catch up within the TTL"""
+    if user_cache is not None:
+        user_cache.discard(user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def invalidate_changed_user(mapper, connection, target):
+    """Any ORM update or delete of a user in this process evicts it from the cache"""
+    invalidate_user(target.id)
+
+
+def get_user_cache_stats() -> Optional[dict]:
+    return user_cache.stats() if user_cache is not None else None
+
+
+def invalid_credentials() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def decode_token(request: Request, credentials: Optional[HTTPAuthorizationCredentials]) -> dict:
+    """Validated JWT payload of the request, raising 401 if there is no usable token"""
+    credentials_exception = invalid_credentials()
     
     # Try to get token from HTTPBearer first
     token = None
@@ -121,7 +268,8 @@ def get_current_user(
         if user_id is None:
             logger.warning("Token payload missing 'sub' field")
             raise credentials_exception
-        user_id_int = int(user_id)
+        payload["sub"] = int(user_id)
+        return payload
     except JWTError as e:
         # Token is invalid or expired
         logger.warning(f"JWT validation failed: {str(e)}")
@@ -130,9 +278,14 @@ def get_current_user(
         # Invalid user ID format
         logger.warning(f"Invalid user ID format in token: {str(e)}")
         raise credentials_exception
-    
+
+
+def user_from_payload(payload: dict) -> User:
+    """The token's user, loaded (or taken from the cache), raising 401 if it no longer exists"""
+    credentials_exception = invalid_credentials()
+    user_id_int = payload["sub"]
     try:
-        user = db.query(User).filter(User.id == user_id_int).first()
+        user = get_user(user_id_int)
         if user is None:
             logger.warning(f"User not found for ID: {user_id_int}")
             raise credentials_exception
@@ -142,3 +295,25 @@ def get_current_user(
         logger.error(f"Database error while fetching user: {str(e)}")
         raise credentials_exception
 
+
+def get_current_user(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
+) -> User:
+    """Get current authenticated user from JWT token"""
+    return user_from_payload(decode_token(request, credentials))
+
+
+def get_token_user(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
+) -> User:
+    """Authenticate hot endpoints, from the token's signed claims alone when JWT_TRUST_CLAIMS is on.
+
+    The returned User is not attached to any session and only carries id and
+    email. Tokens issued before the email claim was added fall back to a lookup.
+    """
+    payload = decode_token(request, credentials)
+    if JWT_TRUST_CLAIMS and payload.get("email"):
+        return User(id=payload["sub"], email=payload["email"])
+    return user_from_payload(payload)
@@ -0,0 +1,159 @@
+import os
+import re
+import gzip
+import json
+import math
+import heapq
+import logging
+from collections import Counter
+from typing import Iterable, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Lexical index settings
+LEXICAL_INDEX_ENABLED = os.getenv("LEXICAL_INDEX_ENABLED", "true").lower() == "true"
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+WORD_RE = re.compile(r"[A-Za-z0-9_]+")
+# Pieces of camelCase / PascalCase / snake_case identifiers
+SUBWORD_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased words, plus the parts of code identifiers so `getUserById` also matches `user`"""
+    tokens = []
+    for word in WORD_RE.findall(text):
+        lowered = word.lower()
+        if lowered not in STOPWORDS:
+            tokens.append(lowered)
+        parts = SUBWORD_RE.findall(word)
+        if len(parts) > 1:
+            tokens.extend(part.lower() for part in parts if len(part) > 1 and part.lower() not in STOPWORDS)
+    return tokens
+
+
+class BM25Index:
+    """In-memory inverted index scoring chunks with Okapi BM25.
+
+    Chunks are identified by their Chroma ids; postings map each term to the
+    chunks containing it and the term's frequency there.
+    """
+
+    def __init__(self):
+        self.ids: list[str] = []
+        self.lengths: list[int] = []
+        self.postings: dict[str, list[tuple[int, int]]] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, doc_id: str, text: str):
+        tokens = tokenize(text)
+        position = len(self.ids)
+        self.ids.append(doc_id)
+        self.lengths.append(len(tokens))
+        self.total_length += len(tokens)
+        for term, frequency in Counter(tokens).items():
+            self.postings.setdefault(term, []).append((position, frequency))
+
+    def search(self, query: str, n: int) -> list[tuple[str, float]]:
+        """Top n (chunk id, score) pairs for a query, best first"""
+        if not self.ids:
+            return []
+        doc_count = len(self.ids)
+        average_length = self.total_length / doc_count or 1.0
+        scores: dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for position, frequency in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[position] / average_length)
+                scores[position] = scores.get(position, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        best = heapq.nlargest(n, scores.items(), key=lambda item: item[1])
+        return [(self.ids[position], score) for position, score in best]
+
+    @property
+    def size_bytes(self) -> int:
+        # Rough CPython cost: ~100 bytes per posting tuple, ~100 per term and id
+        postings = sum(len(entries) for entries in self.postings.values())
+        return postings * 100 + (len(self.postings) + len(self.ids)) * 100
+
+    def save(self, path: str):
+        """Write the index atomically as gzipped JSON"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = {
+            "ids": self.ids,
+            "lengths": self.lengths,
+            "postings": {term: [item for pair in entries for item in pair] for term, entries in self.postings.items()},
+        }
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(payload, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            payload = json.load(f)
+        index = cls()
+        index.ids = payload["ids"]
+        index.lengths = payload["lengths"]
+        index.total_length = sum(index.lengths)
+        index.postings = {
+            term: list(zip(flat[0::2], flat[1::2])) for term, flat in payload["postings"].items()
+        }
+        return index
+
+
+def build_index(documents: Iterable[tuple[str, str]]) -> BM25Index:
+    """Index (chunk id, text) pairs"""
+    index = BM25Index()
+    for doc_id, text in documents:
+        index.add(doc_id, text or "")
+    return index
+
+
+def iter_collection_texts(collection, batch_size: int = 1000) -> Iterable[tuple[str, str]]:
+    """(id, text) for every chunk of a Chroma collection, read in pages"""
+    offset = 0
+    while True:
+        rows = collection.get(limit=batch_size, offset=offset, include=["documents"])
+        if not rows["ids"]:
+            return
+        yield from zip(rows["ids"], rows["documents"])
+        offset += len(rows["ids"])
+
+
+def lexical_index_path(persist_dir: str, collection_name: str) -> str:
+    """The index lives beside Chroma's data so it is backed up and removed with it"""
+    return os.path.join(persist_dir, "bm25", f"{collection_name}.json.gz")
+
+
+def load_lexical_index(persist_dir: str, collection_name: str) -> Optional[BM25Index]:
+    path = lexical_index_path(persist_dir, collection_name)
+    if not os.path.exists(path):
+        return None
+    try:
+        return BM25Index.load(path)
+    except Exception as e:
+        logger.warning(f"Could not load lexical index {path}: {e}")
+        return None
+
+
+def delete_lexical_index(persist_dir: str, collection_name: str):
+    try:
+        os.unlink(lexical_index_path(persist_dir, collection_name))
+    except FileNotFoundError:
+        pass
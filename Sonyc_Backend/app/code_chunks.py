@@ -0,0 +1,80 @@
+import os
+import logging
+from functools import lru_cache
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from langchain_text_splitters import Language, RecursiveCharacterTextSplitter
+
+load_dotenv()
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Repository chunking settings; code is split per file, so chunks never straddle two files
+GIT_CHUNK_SIZE = int(os.getenv("GIT_CHUNK_SIZE", "1500"))
+GIT_CHUNK_OVERLAP = int(os.getenv("GIT_CHUNK_OVERLAP", "150"))
+
+# File extension -> language name; names that langchain_text_splitters knows get syntax-aware separators
+LANGUAGE_BY_EXTENSION = {
+    ".py": "python", ".js": "js", ".jsx": "js", ".ts": "ts", ".tsx": "ts",
+    ".java": "java", ".kt": "kotlin", ".kts": "kotlin", ".scala": "scala",
+    ".c": "c", ".h": "c", ".cpp": "cpp", ".hpp": "cpp", ".cs": "csharp",
+    ".rs": "rust", ".go": "go", ".swift": "swift", ".php": "php", ".rb": "ruby",
+    ".pl": "perl", ".pm": "perl", ".lua": "lua", ".md": "markdown", ".html": "html",
+}
+
+
+def detect_language(path: str) -> str:
+    """Language name for a file path, falling back to its extension"""
+    extension = os.path.splitext(path)[1].lower()
+    return LANGUAGE_BY_EXTENSION.get(extension, extension.lstrip(".") or "text")
+
+
+@lru_cache(maxsize=64)
+def get_splitter(language: str, chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    try:
+        return RecursiveCharacterTextSplitter.from_language(
+            Language(language), chunk_size=chunk_size, chunk_overlap=chunk_overlap, add_start_index=True
+        )
+    except ValueError:
+        # Not a language the splitter knows (json, yaml, txt, ...): plain paragraph/line splitting
+        return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, add_start_index=True)
+
+
+def split_repo_file(path: str, text: str, chunk_size: int = GIT_CHUNK_SIZE, chunk_overlap: int = GIT_CHUNK_OVERLAP) -> list[Document]:
+    """Split one repository file into Documents carrying path, language and line-range metadata.
+
+    Each chunk is prefixed with its file path and lines so the model can cite
+    them, and so identifiers in the path are searchable too.
+    """
+    language = detect_language(path)
+    directory = os.path.dirname(path) or "."
+    chunks = get_splitter(language, chunk_size, chunk_overlap).create_documents([text])
+
+    documents = []
+    # Chunk start offsets only move forward, so line numbers are counted incrementally
+    position, line = 0, 1
+    for chunk in chunks:
+        start = max(chunk.metadata.get("start_index", position), position)
+        line += text.count("\n", position, start)
+        position = start
+        line_end = line + chunk.page_content.count("\n")
+        documents.append(Document(
+            page_content=f"File: {path} (lines {line}-{line_end})\n{chunk.page_content}",
+            metadata={
+                "source": path,
+                "path": path,
+                "dir": directory,
+                "language": language,
+                "line_start": line,
+                "line_end": line_end,
+            },
+        ))
+    return documents
+
+
+def path_filter_clause(path: str) -> dict:
+    """Chroma metadata filter matching one file, or every file directly inside a directory"""
+    path = path.strip().strip("/") or "."
+    return {"$or": [{"path": path}, {"dir": path}]}
@@ -0,0 +1,178 @@
+import os
+import re
+import logging
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from .context_window import estimate_tokens, CHARS_PER_TOKEN
+
+load_dotenv()
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# RAG context assembly settings
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "3000"))
+# Earlier turns of a RAG chat sent with the question, and used to condense follow-ups
+RAG_HISTORY_TOKEN_BUDGET = int(os.getenv("RAG_HISTORY_TOKEN_BUDGET", "1500"))
+RAG_CONDENSE_ENABLED = os.getenv("RAG_CONDENSE_ENABLED", "true").lower() == "true"
+# Small, fast model that rewrites follow-ups into standalone retrieval queries
+RAG_CONDENSE_MODEL = os.getenv("RAG_CONDENSE_MODEL", "ministral-8b-latest")
+RAG_CONDENSE_TIMEOUT_SECONDS = float(os.getenv("RAG_CONDENSE_TIMEOUT_SECONDS", "5"))
+# Shortest shared text treated as chunk overlap rather than coincidence
+MIN_OVERLAP_CHARS = 30
+# Longest overlap searched for; the splitters use at most 600
+MAX_OVERLAP_CHARS = 1000
+# A partially fitting chunk is trimmed only if at least this much budget is left for it
+MIN_TRIMMED_TOKENS = 50
+SEPARATOR = "\n"
+# Header code_chunks.split_repo_file puts on every git chunk
+CHUNK_HEADER_RE = re.compile(r"\AFile: [^\n]* \(lines \d+-\d+\)\n")
+
+
+class ContextPiece:
+    """One retrieved chunk (or several merged overlapping chunks) considered for the prompt"""
+
+    def __init__(self, text: str, rank: int, metadata: Optional[dict] = None):
+        metadata = metadata or {}
+        self.text = text
+        self.rank = rank
+        self.source = metadata.get("path") or metadata.get("source")
+        # Git chunks are placed by line, PDF chunks by page, then any chunk by its index in the source
+        self.position = (metadata.get("line_start") or metadata.get("page") or 0, metadata.get("chunk_index") or 0)
+        self.truncated = False
+
+
+class AssembledContext:
+    def __init__(self, text: str, tokens: int, chunks_in: int, chunks_used: int, merged: int, duplicates: int, truncated: bool):
+        self.text = text
+        self.tokens = tokens
+        self.chunks_in = chunks_in
+        self.chunks_used = chunks_used
+        self.merged = merged
+        self.duplicates = duplicates
+        self.truncated = truncated
+
+
+def strip_chunk_header(text: str) -> str:
+    return CHUNK_HEADER_RE.sub("", text, count=1)
+
+
+def overlap_length(left: str, right: str) -> int:
+    """Length of the longest suffix of left that is also a prefix of right"""
+    if len(right) < MIN_OVERLAP_CHARS:
+        return 0
+    head = right[:MIN_OVERLAP_CHARS]
+    # Only places where right's opening characters occur in left's tail can start an overlap
+    start = left.find(head, max(0, len(left) - min(len(right), MAX_OVERLAP_CHARS)))
+    while start != -1:
+        if right.startswith(left[start:]):
+            return len(left) - start
+        start = left.find(head, start + 1)
+    return 0
+
+
+def trim_to_tokens(text: str, tokens: int) -> str:
+    """Cut text to about `tokens` tokens, backing off to the last line or word break"""
+    limit = tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    for boundary in ("\n", ". ", " "):
+        index = cut.rfind(boundary)
+        if index > limit // 2:
+            return cut[:index + len(boundary)].rstrip()
+    return cut
+
+
+def assemble_context(docs: list, token_budget: int = RAG_CONTEXT_TOKEN_BUDGET) -> AssembledContext:
+    """Build the context block for a RAG prompt from retrieved chunks.
+
+    Duplicate and contained chunks are dropped and chunks that overlap
+    (consecutive splitter output shares chunk_overlap characters) are
+    stitched back together. Pieces are then taken best-ranked first until
+    the token budget is spent, the last one trimmed if it only partly fits,
+    and finally laid out grouped by source in source order so the model
+    reads neighbouring passages in sequence.
+    """
+    pieces = []
+    duplicates = 0
+    for rank, doc in enumerate(docs):
+        text = doc.page_content.strip()
+        if not text or any(text in piece.text for piece in pieces):
+            duplicates += 1
+            continue
+        # A later, longer chunk can also swallow an earlier one
+        contained = [piece for piece in pieces if piece.text in text]
+        for piece in contained:
+            pieces.remove(piece)
+            rank = min(rank, piece.rank)
+        duplicates += len(contained)
+        pieces.append(ContextPiece(text, rank, doc.metadata))
+
+    merged = 0
+    merging = True
+    while merging:
+        merging = False
+        for left in pieces:
+            for right in pieces:
+                if left is right or left.source != right.source:
+                    continue
+                # The overlap is in the chunk bodies, after any "File: ..." header
+                body = strip_chunk_header(right.text)
+                size = overlap_length(left.text, body)
+                if size:
+                    left.text += body[size:]
+                    left.rank = min(left.rank, right.rank)
+                    left.position = min(left.position, right.position)
+                    pieces.remove(right)
+                    merged += 1
+                    merging = True
+                    break
+            if merging:
+                break
+
+    selected = []
+    used_tokens = 0
+    separator_tokens = estimate_tokens(SEPARATOR)
+    for piece in sorted(pieces, key=lambda piece: piece.rank):
+        remaining = token_budget - used_tokens - (separator_tokens if selected else 0)
+        piece_tokens = estimate_tokens(piece.text)
+        if piece_tokens > remaining:
+            if remaining < MIN_TRIMMED_TOKENS:
+                break
+            piece.text = trim_to_tokens(piece.text, remaining)
+            piece.truncated = True
+            piece_tokens = estimate_tokens(piece.text)
+        selected.append(piece)
+        used_tokens += piece_tokens + (separator_tokens if len(selected) > 1 else 0)
+        if piece.truncated:
+            break
+
+    # Sources appear in order of their best chunk; chunks of one source in document order.
+    # Chunks without a source come from the collection's single document (PDF, transcript, page).
+    source_rank = {}
+    for piece in selected:
+        source_rank[piece.source] = min(source_rank.get(piece.source, piece.rank), piece.rank)
+    selected.sort(key=lambda piece: (source_rank[piece.source], piece.position, piece.rank))
+
+    text = SEPARATOR.join(piece.text for piece in selected)
+    return AssembledContext(
+        text=text,
+        tokens=estimate_tokens(text),
+        chunks_in=len(docs),
+        chunks_used=len(selected),
+        merged=merged,
+        duplicates=duplicates,
+        truncated=any(piece.truncated for piece in selected),
+    )
+
+
+def format_history(messages: list) -> str:
+    """Plain-text transcript of chat turns for a prompt"""
+    lines = []
+    for message in messages:
+        role = "User" if message.type == "human" else "Assistant"
+        lines.append(f"{role}: {message.content}")
+    return "\n".join(lines)
@@ -0,0 +1,120 @@
+import os
+import math
+import logging
+from typing import Awaitable, Callable, Optional
+
+from dotenv import load_dotenv
+from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage, AIMessage
+
+load_dotenv()
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Context window settings
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+CONTEXT_SUMMARY_ENABLED = os.getenv("CONTEXT_SUMMARY_ENABLED", "false").lower() == "true"
+
+# Mistral's tokenizer averages roughly 4 characters per token on English text
+CHARS_PER_TOKEN = 4
+MESSAGE_TOKEN_OVERHEAD = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used for budgeting (no tokenizer round trip)"""
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def message_tokens(message: BaseMessage) -> int:
+    """Estimated tokens for one chat message including role overhead"""
+    return estimate_tokens(str(message.content)) + MESSAGE_TOKEN_OVERHEAD
+
+
+class ContextWindow:
+    """Chat history with incremental token accounting and a sliding prompt window.
+
+    Token counts are computed once per message as it is appended, so picking
+    the window for a turn is a walk over cached integers. When summaries are
+    enabled, turns that slide out of the window are folded into a rolling
+    summary that is sent as a second system message.
+    """
+
+    def __init__(self, system_message: SystemMessage, token_budget: int = CONTEXT_TOKEN_BUDGET):
+        self.system_message = system_message
+        self.system_tokens = message_tokens(system_message)
+        self.token_budget = token_budget
+        self.messages: list[BaseMessage] = []
+        self.token_counts: list[int] = []
+        self.total_tokens = 0
+        self.size_bytes = 0
+        # Rolling summary of messages[:summarized_upto]
+        self.summary: Optional[str] = None
+        self.summary_tokens = 0
+        self.summarized_upto = 0
+
+    def add_message(self, message: BaseMessage):
+        tokens = message_tokens(message)
+        self.messages.append(message)
+        self.token_counts.append(tokens)
+        self.total_tokens += tokens
+        self.size_bytes += len(str(message.content).encode("utf-8"))
+
+    def add_user_message(self, content: str):
+        self.add_message(HumanMessage(content=content))
+
+    def add_ai_message(self, content: str):
+        self.add_message(AIMessage(content=content))
+
+    def window_start(self) -> int:
+        """Index of the oldest message that fits in the budget (the latest message always fits)"""
+        available = self.token_budget - self.system_tokens - self.summary_tokens
+        start = len(self.messages)
+        used = 0
+        while start > 0 and (used + self.token_counts[start - 1] <= available or start == len(self.messages)):
+            used += self.token_counts[start - 1]
+            start -= 1
+        # Never open the window on an assistant reply without the question that prompted it
+        while start < len(self.messages) - 1 and not isinstance(self.messages[start], HumanMessage):
+            start += 1
+        return start
+
+    def recent_turns(self, token_budget: int, end: Optional[int] = None) -> list[BaseMessage]:
+        """Newest messages before index `end` that fit in token_budget, opening on a user message"""
+        end = len(self.messages) if end is None else end
+        start = end
+        used = 0
+        while start > 0 and used + self.token_counts[start - 1] <= token_budget:
+            used += self.token_counts[start - 1]
+            start -= 1
+        while start < end and not isinstance(self.messages[start], HumanMessage):
+            start += 1
+        return self.messages[start:end]
+
+    def build_prompt(self) -> list[BaseMessage]:
+        """System message, optional rolling summary, then the newest turns that fit the budget"""
+        start = self.window_start()
+        prompt: list[BaseMessage] = [self.system_message]
+        if self.summary and start > 0:
+            prompt.append(SystemMessage(content=f"Summary of the earlier conversation:\n{self.summary}"))
+        prompt.extend(self.messages[start:])
+        return prompt
+
+    def prompt_tokens(self) -> int:
+        start = self.window_start()
+        summary_tokens = self.summary_tokens if self.summary and start > 0 else 0
+        return self.system_tokens + summary_tokens + sum(self.token_counts[start:])
+
+    async def refresh_summary(self, summarize: Callable[[Optional[str], list[BaseMessage]], Awaitable[str]]):
+        """Fold messages that have slid out of the window into the rolling summary"""
+        start = self.window_start()
+        if start <= self.summarized_upto:
+            return
+        dropped = self.messages[self.summarized_upto:start]
+        summary = await summarize(self.summary, dropped)
+        if summary:
+            self.summary = summary
+            self.summary_tokens = estimate_tokens(summary) + MESSAGE_TOKEN_OVERHEAD
+            self.summarized_upto = start
+            logger.info(f"Rolling summary now covers {start} messages ({self.summary_tokens} tokens)")
@@ -0,0 +1,132 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from array import array
+
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+
+load_dotenv()
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Embedding cache settings
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(os.getcwd(), "embedding_cache.sqlite3"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+# Fraction of entries removed when the cap is exceeded, so eviction runs rarely
+EVICTION_FRACTION = 0.1
+# SQLite's default limit on bound parameters per statement is 999
+SQLITE_BATCH = 500
+
+
+def content_key(model_name: str, text: str) -> str:
+    """Content address of one chunk for one embedding model"""
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that serves repeat chunks from a local SQLite cache.
+
+    Vectors are keyed by sha256(model, text) and stored as float32 blobs, so
+    the same transcript, page or repo ingested by many users is embedded once.
+    Entries carry a last-used timestamp and the least recently used ones are
+    evicted in bulk once the entry cap is exceeded.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        logger.info(f"Embedding cache opened at {path} ({self._entries} entries)")
+
+    def _lookup(self, keys: list[str]) -> dict[str, list[float]]:
+        found = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), SQLITE_BATCH):
+                batch = keys[i:i + SQLITE_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE key IN ({','.join('?' * len(rows))})",
+                        [now] + [key for key, _ in rows],
+                    )
+            self._conn.commit()
+        return found
+
+    def _store(self, items: dict[str, list[float]]):
+        now = time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), now) for key, vector in items.items()],
+            )
+            self._entries += self._conn.total_changes - before
+            if self._entries > self.max_entries:
+                evict = max(1, int(self.max_entries * EVICTION_FRACTION)) + self._entries - self.max_entries
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (evict,),
+                )
+                self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                self.evictions += evict
+                logger.info(f"Embedding cache evicted {evict} least recently used entries")
+            self._conn.commit()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = [content_key(self.model_name, text) for text in texts]
+        cached = self._lookup(list(set(keys)))
+
+        # Embed each distinct missing chunk once, even if it repeats within the batch
+        missing: dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        with self._lock:
+            self.hits += len(texts) - sum(1 for key in keys if key in missing)
+            self.misses += sum(1 for key in keys if key in missing)
+
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self._store(fresh)
+            cached.update(fresh)
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embeddings.embed_query(text)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": self._entries,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
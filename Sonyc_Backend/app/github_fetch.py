@@ -0,0 +1,207 @@
+import os
+import logging
+import tarfile
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, Optional
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# GitHub fetch settings
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+# "tarball" downloads the whole snapshot in one request; "contents" fetches matching files one by one
+GITHUB_FETCH_MODE = os.getenv("GITHUB_FETCH_MODE", "tarball")
+GITHUB_FETCH_CONCURRENCY = int(os.getenv("GITHUB_FETCH_CONCURRENCY", "8"))
+# Larger files are almost always generated data, lockfiles or vendored bundles
+GITHUB_MAX_FILE_BYTES = int(os.getenv("GITHUB_MAX_FILE_BYTES", str(1024 * 1024)))
+GITHUB_TIMEOUT_SECONDS = float(os.getenv("GITHUB_TIMEOUT_SECONDS", "30"))
+# The compare API lists at most this many changed files; bigger diffs need a full re-ingest
+GITHUB_COMPARE_MAX_FILES = 300
+
+GITHUB_FILE_EXTENSIONS = (
+    ".txt", ".md", ".html", ".css", ".xml", ".json", ".yaml", ".yml",
+    ".py", ".js", ".ts", ".jsx", ".tsx", ".java", ".kt", ".kts", ".scala",
+    ".c", ".cpp", ".h", ".hpp", ".rs", ".go", ".swift", ".m", ".php",
+    ".rb", ".pl", ".pm", ".lua", ".sh", ".bash", ".r", ".jl", ".asm",
+    ".s", ".dart", ".cs", ".ipynb",
+)
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def is_supported_file(path: str) -> bool:
+    return path.endswith(GITHUB_FILE_EXTENSIONS)
+
+
+def get_github_session() -> requests.Session:
+    """Shared session so repeated fetches reuse pooled connections to GitHub"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(GITHUB_FETCH_CONCURRENCY, 10))
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def _headers(token: Optional[str], accept: str = "application/vnd.github+json") -> dict:
+    headers = {"Accept": accept}
+    if token:
+        headers["Authorization"] = f"token {token}"
+    return headers
+
+
+def _decode(data: bytes) -> Optional[str]:
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+
+def iter_tarball_files(repo_id: str, ref: str, token: Optional[str], api_url: str = GITHUB_API_URL) -> Iterator[tuple[str, str]]:
+    """Yield (path, text) for matching files while the repository archive is still downloading"""
+    url = f"{api_url}/repos/{repo_id}/tarball/{quote(ref, safe='')}"
+    with get_github_session().get(url, headers=_headers(token), stream=True, timeout=GITHUB_TIMEOUT_SECONDS) as resp:
+        resp.raise_for_status()
+        resp.raw.decode_content = True
+        with tarfile.open(fileobj=resp.raw, mode="r|gz") as archive:
+            for member in archive:
+                if not member.isfile() or member.size > GITHUB_MAX_FILE_BYTES:
+                    continue
+                # Archive entries are prefixed with "<owner>-<repo>-<sha>/"
+                path = member.name.split("/", 1)[1] if "/" in member.name else member.name
+                if not is_supported_file(path):
+                    continue
+                text = _decode(archive.extractfile(member).read())
+                if text is not None:
+                    yield path, text
+
+
+def list_repo_files(repo_id: str, ref: str, token: Optional[str], api_url: str = GITHUB_API_URL) -> list[str]:
+    """Paths of matching files in the repository tree at ref"""
+    url = f"{api_url}/repos/{repo_id}/git/trees/{quote(ref, safe='')}?recursive=1"
+    resp = get_github_session().get(url, headers=_headers(token), timeout=GITHUB_TIMEOUT_SECONDS)
+    resp.raise_for_status()
+    tree = resp.json()
+    if tree.get("truncated"):
+        logger.warning(f"GitHub truncated the file tree of {repo_id}@{ref}; some files will be missing")
+    return [
+        entry["path"] for entry in tree.get("tree", [])
+        if entry.get("type") == "blob"
+        and entry.get("size", 0) <= GITHUB_MAX_FILE_BYTES
+        and is_supported_file(entry["path"])
+    ]
+
+
+def fetch_file(repo_id: str, ref: str, path: str, token: Optional[str], api_url: str = GITHUB_API_URL) -> Optional[str]:
+    url = f"{api_url}/repos/{repo_id}/contents/{quote(path)}?ref={quote(ref, safe='')}"
+    resp = get_github_session().get(url, headers=_headers(token, "application/vnd.github.raw"), timeout=GITHUB_TIMEOUT_SECONDS)
+    resp.raise_for_status()
+    return _decode(resp.content)
+
+
+def iter_files_at(
+    repo_id: str,
+    ref: str,
+    paths: Iterable[str],
+    token: Optional[str],
+    concurrency: int = GITHUB_FETCH_CONCURRENCY,
+    api_url: str = GITHUB_API_URL,
+) -> Iterator[tuple[str, str]]:
+    """Yield (path, text) for the given paths in order, fetching up to `concurrency` files at once"""
+    paths = iter(paths)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="github-fetch") as pool:
+        try:
+            for path in itertools.islice(paths, concurrency * 2):
+                pending.append((path, pool.submit(fetch_file, repo_id, ref, path, token, api_url)))
+            while pending:
+                path, future = pending.popleft()
+                text = future.result()
+                next_path = next(paths, None)
+                if next_path is not None:
+                    pending.append((next_path, pool.submit(fetch_file, repo_id, ref, next_path, token, api_url)))
+                if text is not None:
+                    yield path, text
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+def iter_contents_files(
+    repo_id: str,
+    ref: str,
+    token: Optional[str],
+    concurrency: int = GITHUB_FETCH_CONCURRENCY,
+    api_url: str = GITHUB_API_URL,
+) -> Iterator[tuple[str, str]]:
+    """Yield (path, text) for every matching file, fetched individually"""
+    return iter_files_at(repo_id, ref, list_repo_files(repo_id, ref, token, api_url), token, concurrency, api_url)
+
+
+def iter_repo_files(
+    repo_id: str,
+    ref: str,
+    token: Optional[str],
+    mode: str = GITHUB_FETCH_MODE,
+    api_url: str = GITHUB_API_URL,
+) -> Iterator[tuple[str, str]]:
+    """Yield (path, text) for every supported file of a repository snapshot.
+
+    Tarball mode falls back to per-file fetches if the archive cannot be
+    downloaded before any file has been produced.
+    """
+    if mode == "tarball":
+        produced = False
+        try:
+            for item in iter_tarball_files(repo_id, ref, token, api_url):
+                produced = True
+                yield item
+            return
+        except (requests.RequestException, tarfile.TarError) as e:
+            if produced:
+                raise
+            logger.warning(f"Archive download failed for {repo_id}@{ref}, fetching files individually: {e}")
+    yield from iter_contents_files(repo_id, ref, token, api_url=api_url)
+
+
+def compare_commits(repo_id: str, base: str, head: str, token: Optional[str], api_url: str = GITHUB_API_URL) -> Optional[tuple[list[str], list[str]]]:
+    """Files that changed between two commits, as (paths to fetch, paths whose old chunks are stale).
+
+    Returns None when the diff cannot be used incrementally: the compare call
+    failed (e.g. base was force-pushed away) or GitHub truncated the file list.
+    """
+    url = f"{api_url}/repos/{repo_id}/compare/{base}...{head}"
+    try:
+        resp = get_github_session().get(url, headers=_headers(token), timeout=GITHUB_TIMEOUT_SECONDS)
+        resp.raise_for_status()
+        files = resp.json().get("files", [])
+    except (requests.RequestException, ValueError) as e:
+        logger.warning(f"Could not compare {repo_id} {base[:7]}...{head[:7]}: {e}")
+        return None
+    if len(files) >= GITHUB_COMPARE_MAX_FILES:
+        logger.info(f"{repo_id} {base[:7]}...{head[:7]} changes {len(files)}+ files, too many for an incremental update")
+        return None
+
+    fetch, stale = [], []
+    for entry in files:
+        path, status = entry["filename"], entry.get("status")
+        if entry.get("previous_filename"):
+            stale.append(entry["previous_filename"])
+        if status != "added":
+            stale.append(path)
+        if status != "removed" and is_supported_file(path):
+            fetch.append(path)
+    return fetch, stale
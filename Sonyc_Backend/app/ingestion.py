@@ -0,0 +1,155 @@
+import os
+import time
+import uuid
+import random
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Iterable, Optional
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+load_dotenv()
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Embedding pipeline settings
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "6"))
+EMBED_BACKOFF_SECONDS = float(os.getenv("EMBED_BACKOFF_SECONDS", "1.0"))
+EMBED_BACKOFF_MAX_SECONDS = 30.0
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True if an embedding call failed because of rate limiting (HTTP 429)"""
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) == 429:
+        return True
+    message = str(error).lower()
+    return "429" in message or "rate limit" in message or "too many requests" in message
+
+
+def embed_with_retry(embedding_model, texts: list[str]) -> list[list[float]]:
+    """Embed one batch, backing off exponentially (with jitter) on rate limits"""
+    attempt = 0
+    while True:
+        try:
+            return embedding_model.embed_documents(texts)
+        except Exception as e:
+            attempt += 1
+            if attempt > EMBED_MAX_RETRIES or not is_rate_limit_error(e):
+                raise
+            delay = min(EMBED_BACKOFF_MAX_SECONDS, EMBED_BACKOFF_SECONDS * 2 ** (attempt - 1))
+            delay *= 0.5 + random.random() / 2
+            logger.warning(f"Embedding rate limited (attempt {attempt}/{EMBED_MAX_RETRIES}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def batched(items: Iterable, size: int):
+    """Yield lists of up to size items from any iterable without materialising it"""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def write_batch(collection, docs: list[Document], embeddings: list[list[float]]) -> list[str]:
+    """Upsert pre-embedded documents into a Chroma collection and return their ids"""
+    ids = [doc.id or uuid.uuid4().hex for doc in docs]
+    # Chroma rejects empty metadata dicts, so documents without metadata are written separately
+    with_meta = [i for i, doc in enumerate(docs) if doc.metadata]
+    without_meta = [i for i, doc in enumerate(docs) if not doc.metadata]
+    if with_meta:
+        collection.upsert(
+            ids=[ids[i] for i in with_meta],
+            embeddings=[embeddings[i] for i in with_meta],
+            documents=[docs[i].page_content for i in with_meta],
+            metadatas=[docs[i].metadata for i in with_meta],
+        )
+    if without_meta:
+        collection.upsert(
+            ids=[ids[i] for i in without_meta],
+            embeddings=[embeddings[i] for i in without_meta],
+            documents=[docs[i].page_content for i in without_meta],
+        )
+    return ids
+
+
+def ingest_documents(
+    docs: Iterable[Document],
+    collection_name: str,
+    client,
+    embedding_model,
+    batch_size: int = EMBED_BATCH_SIZE,
+    concurrency: int = EMBED_CONCURRENCY,
+    progress: Optional[Callable[[int], None]] = None,
+) -> int:
+    """Embed documents in concurrent batches and write them to Chroma as each batch lands.
+
+    Up to `concurrency` batches are embedding at any time; the calling thread
+    writes finished batches (oldest first) while the rest are still in flight,
+    so Chroma writes overlap with embedding. `docs` may be a lazy iterable and
+    is consumed only as fast as batches are submitted. Returns the chunk count.
+    """
+    collection = client.get_or_create_collection(name=collection_name, embedding_function=None)
+    start = time.perf_counter()
+    written = 0
+    pending = deque()
+
+    def drain_oldest():
+        nonlocal written
+        batch, future = pending.popleft()
+        write_batch(collection, batch, future.result())
+        written += len(batch)
+        if progress is not None:
+            progress(written)
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="embed") as pool:
+        try:
+            for batch in batched(docs, batch_size):
+                if len(pending) >= concurrency:
+                    drain_oldest()
+                texts = [doc.page_content for doc in batch]
+                pending.append((batch, pool.submit(embed_with_retry, embedding_model, texts)))
+            while pending:
+                drain_oldest()
+        except BaseException:
+            for _, future in pending:
+                future.cancel()
+            raise
+
+    elapsed = time.perf_counter() - start
+    rate = written / elapsed if elapsed > 0 else 0.0
+    logger.info(f"Ingested {written} chunks into {collection_name} in {elapsed:.2f}s ({rate:.1f} chunks/sec, batch={batch_size}, concurrency={concurrency})")
+    return written
+
+
+def copy_collection(client, source_name: str, target_name: str, batch_size: int = 1000) -> int:
+    """Copy every chunk, vector and metadata of a collection into a new one, without re-embedding"""
+    source = client.get_collection(source_name)
+    target = client.get_or_create_collection(name=target_name, embedding_function=None)
+    copied = 0
+    while True:
+        rows = source.get(limit=batch_size, offset=copied, include=["embeddings", "documents", "metadatas"])
+        if not rows["ids"]:
+            break
+        docs = [
+            Document(id=doc_id, page_content=text, metadata=metadata or {})
+            for doc_id, text, metadata in zip(rows["ids"], rows["documents"], rows["metadatas"])
+        ]
+        write_batch(target, docs, [list(vector) for vector in rows["embeddings"]])
+        copied += len(docs)
+    logger.info(f"Copied {copied} chunks from {source_name} to {target_name}")
+    return copied
+
+
+def delete_paths(collection, paths: list[str], batch_size: int = 100):
+    """Remove every chunk whose `path` metadata is one of paths"""
+    for i in range(0, len(paths), batch_size):
+        collection.delete(where={"path": {"$in": paths[i:i + batch_size]}})
@@ -0,0 +1,299 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import update, or_
+
+from .database import SessionLocal
+from .models import IngestionJob
+
+load_dotenv()
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Background ingestion settings
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "2"))
+INGESTION_SPOOL_DIR = os.getenv("INGESTION_SPOOL_DIR", os.path.join(os.getcwd(), "ingestion_spool"))
+JOB_HEARTBEAT_SECONDS = 30
+# A running job whose heartbeat is older than this belonged to a process that died
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "180"))
+# Progress writes are throttled so embedding is not slowed down by the database
+PROGRESS_WRITE_INTERVAL = 1.0
+
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    """Raised inside an ingestion when its job has been cancelled"""
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobContext:
+    """Progress reporting handle passed to ingestion functions.
+
+    Created without a job id it does nothing, which is what the synchronous
+    endpoints use, so the same ingestion code serves both paths.
+    """
+
+    def __init__(self, job_id: Optional[str] = None, manager: Optional["JobManager"] = None):
+        self.job_id = job_id
+        self.manager = manager
+        self._last_write = 0.0
+
+    def _update(self, force: bool = False, **values):
+        if self.job_id is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_write < PROGRESS_WRITE_INTERVAL:
+            return
+        self._last_write = now
+        self.manager.update_job(self.job_id, **values)
+
+    def stage(self, name: str):
+        self.check_cancelled()
+        self._update(force=True, stage=name)
+
+    def total(self, chunks: int):
+        self._update(force=True, chunks_total=chunks)
+
+    def progress(self, chunks_embedded: int):
+        self.check_cancelled()
+        self._update(chunks_embedded=chunks_embedded)
+
+    def check_cancelled(self):
+        if self.job_id is not None and self.manager.is_cancelled(self.job_id):
+            raise JobCancelled(f"Job {self.job_id} was cancelled")
+
+
+class JobManager:
+    """Bounded worker pool for ingestion jobs whose state lives in the ingestion_jobs table.
+
+    Jobs are claimed with an atomic queued -> running update, so several
+    gunicorn workers can resume the same table after a restart without
+    running a job twice.
+    """
+
+    def __init__(self, workers: int = INGESTION_WORKERS):
+        self.workers = workers
+        self._handlers: dict[str, Callable] = {}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._cancelled: set[str] = set()
+        self._running: set[str] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def register(self, source_type: str, handler: Callable):
+        """handler(payload: dict, user_id: int, job: JobContext) -> collection_name
+
+        Handlers get no session: the job can run for minutes, so they open short
+        sessions of their own whenever they touch the database.
+        """
+        self._handlers[source_type] = handler
+
+    def start(self):
+        if self._pool is not None:
+            return
+        os.makedirs(INGESTION_SPOOL_DIR, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest")
+        self._stop.clear()
+        threading.Thread(target=self._heartbeat_loop, name="ingest-heartbeat", daemon=True).start()
+        self.resume()
+
+    def shutdown(self):
+        self._stop.set()
+        if self._pool is not None:
+            # Running jobs keep status "running"; their heartbeat goes stale and the next start re-queues them
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def enqueue(self, user_id: int, source_type: str, payload: dict) -> str:
+        job_id = uuid.uuid4().hex
+        db = SessionLocal()
+        try:
+            db.add(IngestionJob(id=job_id, user_id=user_id, source_type=source_type, payload=json.dumps(payload), status="queued", stage="queued"))
+            db.commit()
+        finally:
+            db.close()
+        self._pool.submit(self._run, job_id)
+        logger.info(f"Queued {source_type} ingestion job {job_id} for user {user_id}")
+        return job_id
+
+    def resume(self):
+        """Re-queue jobs left over from a previous process"""
+        db = SessionLocal()
+        try:
+            stale_before = utcnow() - timedelta(seconds=JOB_STALE_SECONDS)
+            db.execute(
+                update(IngestionJob)
+                .where(
+                    IngestionJob.status == "running",
+                    or_(IngestionJob.heartbeat_at.is_(None), IngestionJob.heartbeat_at < stale_before),
+                )
+                .values(status="queued", stage="queued", chunks_embedded=0)
+            )
+            db.commit()
+            job_ids = [row[0] for row in db.query(IngestionJob.id).filter(IngestionJob.status == "queued").order_by(IngestionJob.created_at).all()]
+        except Exception as e:
+            logger.warning(f"Could not resume ingestion jobs: {e}")
+            return
+        finally:
+            db.close()
+        for job_id in job_ids:
+            self._pool.submit(self._run, job_id)
+        if job_ids:
+            logger.info(f"Resumed {len(job_ids)} queued ingestion jobs")
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; returns False if it already finished"""
+        db = SessionLocal()
+        try:
+            result = db.execute(
+                update(IngestionJob)
+                .where(IngestionJob.id == job_id, IngestionJob.status.notin_(FINISHED_STATUSES))
+                .values(status="cancelled", finished_at=utcnow())
+            )
+            db.commit()
+        finally:
+            db.close()
+        if result.rowcount:
+            with self._lock:
+                self._cancelled.add(job_id)
+            logger.info(f"Cancelled ingestion job {job_id}")
+        return bool(result.rowcount)
+
+    def is_cancelled(self, job_id: str) -> bool:
+        with self._lock:
+            return job_id in self._cancelled
+
+    def update_job(self, job_id: str, **values):
+        """Record progress for a running job; notices cancellations made by other processes"""
+        db = SessionLocal()
+        try:
+            result = db.execute(
+                update(IngestionJob)
+                .where(IngestionJob.id == job_id, IngestionJob.status == "running")
+                .values(heartbeat_at=utcnow(), **values)
+            )
+            db.commit()
+            if not result.rowcount:
+                with self._lock:
+                    self._cancelled.add(job_id)
+        except Exception as e:
+            logger.warning(f"Could not update ingestion job {job_id}: {e}")
+        finally:
+            db.close()
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(JOB_HEARTBEAT_SECONDS):
+            with self._lock:
+                running = list(self._running)
+            for job_id in running:
+                self.update_job(job_id)
+
+    def _claim(self, job_id: str) -> Optional[tuple[str, dict, int]]:
+        """Atomically take a queued job; returns (source_type, payload, user_id), or None if it was not queued"""
+        db = SessionLocal()
+        try:
+            claimed = db.execute(
+                update(IngestionJob)
+                .where(IngestionJob.id == job_id, IngestionJob.status == "queued")
+                .values(status="running", started_at=utcnow(), heartbeat_at=utcnow())
+            )
+            db.commit()
+            if not claimed.rowcount:
+                # Already taken by another worker, or cancelled while queued
+                job = db.query(IngestionJob).filter(IngestionJob.id == job_id).first()
+                if job is not None and job.status == "cancelled":
+                    discard_spooled_upload(json.loads(job.payload))
+                return None
+            job = db.query(IngestionJob).filter(IngestionJob.id == job_id).first()
+            return job.source_type, json.loads(job.payload), job.user_id
+        finally:
+            db.close()
+
+    def _finish(self, job_id: str, **values):
+        db = SessionLocal()
+        try:
+            # A job cancelled mid-flight keeps its cancelled status
+            db.execute(
+                update(IngestionJob)
+                .where(IngestionJob.id == job_id, IngestionJob.status == "running")
+                .values(finished_at=utcnow(), **values)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _run(self, job_id: str):
+        try:
+            claimed = self._claim(job_id)
+            if claimed is None:
+                return
+            source_type, payload, user_id = claimed
+            handler = self._handlers[source_type]
+        except Exception as e:
+            logger.error(f"Could not start ingestion job {job_id}: {e}", exc_info=True)
+            return
+
+        with self._lock:
+            self._running.add(job_id)
+        logger.info(f"Running ingestion job {job_id}")
+        try:
+            collection_name = handler(payload, user_id, JobContext(job_id, self))
+            self._finish(job_id, status="succeeded", stage="done", collection_name=collection_name)
+            logger.info(f"Ingestion job {job_id} succeeded: {collection_name}")
+        except JobCancelled:
+            logger.info(f"Ingestion job {job_id} stopped after cancellation")
+        except Exception as e:
+            detail = getattr(e, "detail", None) or str(e)
+            logger.error(f"Ingestion job {job_id} failed: {detail}", exc_info=True)
+            self._finish(job_id, status="failed", error=str(detail))
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+                self._cancelled.discard(job_id)
+            discard_spooled_upload(payload)
+
+
+def discard_spooled_upload(payload: dict):
+    """Delete an uploaded file a job was holding in the spool directory"""
+    spooled = payload.get("spool_path")
+    if spooled and os.path.exists(spooled):
+        try:
+            os.unlink(spooled)
+        except OSError:
+            pass
+
+
+def job_status(job: IngestionJob) -> dict:
+    """Public view of a job with an ETA estimated from the embedding rate so far"""
+    eta_seconds = None
+    if job.status == "running" and job.started_at and job.chunks_total and job.chunks_embedded:
+        started_at = job.started_at if job.started_at.tzinfo else job.started_at.replace(tzinfo=timezone.utc)
+        elapsed = (utcnow() - started_at).total_seconds()
+        rate = job.chunks_embedded / elapsed if elapsed > 0 else 0
+        if rate > 0:
+            eta_seconds = round((job.chunks_total - job.chunks_embedded) / rate, 1)
+    return {
+        "job_id": job.id,
+        "source_type": job.source_type,
+        "status": job.status,
+        "stage": job.stage,
+        "chunks_embedded": job.chunks_embedded,
+        "chunks_total": job.chunks_total,
+        "eta_seconds": eta_seconds,
+        "collection_name": job.collection_name,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+    }
@@ -0,0 +1,275 @@
+import os
+import time
+import logging
+import threading
+
+import httpx
+from dotenv import load_dotenv
+from langchain_mistralai import ChatMistralAI
+
+load_dotenv()
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Model client settings
+MISTRAL_BASE_URL = os.getenv("MISTRAL_BASE_URL", "https://api.mistral.ai/v1")
+DEFAULT_CHAT_MODEL = "mistral-small-latest"
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+
+# Connection pool limits, applied to every client in the registry
+LLM_POOL_MAX_CONNECTIONS = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "100"))
+LLM_POOL_MAX_KEEPALIVE = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "20"))
+LLM_POOL_KEEPALIVE_EXPIRY = float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY", "60"))
+# Unread response bytes read off a closed response so its connection can go back to the pool;
+# a response with more left than this (e.g. a stream abandoned mid-answer) drops its connection
+LLM_POOL_DRAIN_MAX_BYTES = int(os.getenv("LLM_POOL_DRAIN_MAX_BYTES", "65536"))
+
+
+class PoolMetrics:
+    """Request counters for one pooled model client"""
+
+    def __init__(self):
+        self.created_at = time.time()
+        self.requests = 0
+        self.responses = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def on_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def on_response(self, status_code: int):
+        with self._lock:
+            self.responses += 1
+            if status_code >= 400:
+                self.errors += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "responses": self.responses,
+                "errors": self.errors,
+                "awaiting_response": self.requests - self.responses,
+                "uptime_seconds": round(time.time() - self.created_at, 1),
+            }
+
+
+class DrainingStream(httpx.SyncByteStream):
+    """Response body that reads whatever is left before closing.
+
+    langchain-mistralai stops reading an SSE response at "data: [DONE]" and
+    closes it, leaving the end of the chunked body unread; httpcore only
+    returns a connection to the pool once the body is read to the end, so
+    without this every streamed answer opened a new connection. The
+    underlying iterator is kept here rather than delegated to with
+    "yield from", so abandoning the reader does not close it before close()
+    has drained it.
+    """
+
+    def __init__(self, stream: httpx.SyncByteStream, max_bytes: int):
+        self._stream = stream
+        self._max_bytes = max_bytes
+        self._iterator = None
+        self._exhausted = False
+
+    def __iter__(self):
+        self._iterator = iter(self._stream)
+        for chunk in self._iterator:
+            yield chunk
+        self._exhausted = True
+
+    def close(self):
+        try:
+            # Reading past the end would wait on the socket for the next response
+            if self._iterator is not None and not self._exhausted:
+                drained = 0
+                for chunk in self._iterator:
+                    drained += len(chunk)
+                    if drained > self._max_bytes:
+                        break
+        except httpx.HTTPError:
+            pass
+        finally:
+            self._stream.close()
+
+
+class AsyncDrainingStream(httpx.AsyncByteStream):
+    """Async counterpart of DrainingStream"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, max_bytes: int):
+        self._stream = stream
+        self._max_bytes = max_bytes
+        self._iterator = None
+        self._exhausted = False
+
+    async def __aiter__(self):
+        self._iterator = self._stream.__aiter__()
+        async for chunk in self._iterator:
+            yield chunk
+        self._exhausted = True
+
+    async def aclose(self):
+        try:
+            if self._iterator is not None and not self._exhausted:
+                drained = 0
+                async for chunk in self._iterator:
+                    drained += len(chunk)
+                    if drained > self._max_bytes:
+                        break
+        except httpx.HTTPError:
+            pass
+        finally:
+            await self._stream.aclose()
+
+
+class DrainingTransport(httpx.HTTPTransport):
+    """Pooled transport whose responses drain their unread body on close"""
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        response = super().handle_request(request)
+        response.stream = DrainingStream(response.stream, LLM_POOL_DRAIN_MAX_BYTES)
+        return response
+
+
+class AsyncDrainingTransport(httpx.AsyncHTTPTransport):
+    """Async counterpart of DrainingTransport"""
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await super().handle_async_request(request)
+        response.stream = AsyncDrainingStream(response.stream, LLM_POOL_DRAIN_MAX_BYTES)
+        return response
+
+
+def _pool_connections(client) -> dict:
+    """Best-effort count of open/idle connections in an httpx client's pool"""
+    try:
+        connections = client._transport._pool.connections
+    except AttributeError:
+        return {"open": None, "idle": None}
+    return {
+        "open": len(connections),
+        "idle": sum(1 for conn in connections if conn.is_idle()),
+    }
+
+
+class ModelClientRegistry:
+    """Process-wide, lazily populated cache of ChatMistralAI clients.
+
+    Clients are keyed by (model, temperature, streaming). Each one owns a
+    sync and an async httpx client with keep-alive pooling, so consecutive
+    chat turns and title generations reuse the same TLS connections.
+    """
+
+    def __init__(self):
+        self._clients: dict[tuple, ChatMistralAI] = {}
+        self._http_clients: dict[tuple, tuple[httpx.Client, httpx.AsyncClient]] = {}
+        self._metrics: dict[tuple, PoolMetrics] = {}
+        self._lock = threading.Lock()
+
+    def _build_http_clients(self, metrics: PoolMetrics):
+        headers = {
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+            "Authorization": f"Bearer {os.getenv('MISTRAL_API_KEY', '')}",
+        }
+        limits = httpx.Limits(
+            max_connections=LLM_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=LLM_POOL_KEEPALIVE_EXPIRY,
+        )
+
+        def on_request(request):
+            metrics.on_request()
+
+        def on_response(response):
+            metrics.on_response(response.status_code)
+
+        async def aon_request(request):
+            metrics.on_request()
+
+        async def aon_response(response):
+            metrics.on_response(response.status_code)
+
+        client = httpx.Client(
+            base_url=MISTRAL_BASE_URL,
+            headers=headers,
+            timeout=LLM_TIMEOUT_SECONDS,
+            transport=DrainingTransport(limits=limits),
+            event_hooks={"request": [on_request], "response": [on_response]},
+        )
+        async_client = httpx.AsyncClient(
+            base_url=MISTRAL_BASE_URL,
+            headers=headers,
+            timeout=LLM_TIMEOUT_SECONDS,
+            transport=AsyncDrainingTransport(limits=limits),
+            event_hooks={"request": [aon_request], "response": [aon_response]},
+        )
+        return client, async_client
+
+    def get(self, model: str = DEFAULT_CHAT_MODEL, temperature: float = 0.3, streaming: bool = True) -> ChatMistralAI:
+        """Return the shared client for this configuration, creating it on first use"""
+        key = (model, temperature, streaming)
+        llm = self._clients.get(key)
+        if llm is not None:
+            return llm
+
+        with self._lock:
+            llm = self._clients.get(key)
+            if llm is None:
+                metrics = PoolMetrics()
+                client, async_client = self._build_http_clients(metrics)
+                llm = ChatMistralAI(
+                    model=model,
+                    temperature=temperature,
+                    streaming=streaming,
+                    api_key=os.getenv("MISTRAL_API_KEY"),
+                    endpoint=MISTRAL_BASE_URL,
+                    timeout=int(LLM_TIMEOUT_SECONDS),
+                    client=client,
+                    async_client=async_client,
+                )
+                self._http_clients[key] = (client, async_client)
+                self._metrics[key] = metrics
+                self._clients[key] = llm
+                logger.info(f"Created pooled ChatMistralAI client: model={model}, temperature={temperature}, streaming={streaming}")
+        return llm
+
+    def stats(self) -> dict:
+        """Per-client request counters and connection pool occupancy"""
+        stats = {}
+        for key, metrics in list(self._metrics.items()):
+            model, temperature, streaming = key
+            client, async_client = self._http_clients[key]
+            stats[f"{model}|t={temperature}|stream={streaming}"] = {
+                **metrics.snapshot(),
+                "sync_pool": _pool_connections(client),
+                "async_pool": _pool_connections(async_client),
+            }
+        return stats
+
+    async def aclose(self):
+        """Close every pooled connection (called on application shutdown)"""
+        with self._lock:
+            http_clients = list(self._http_clients.values())
+            self._clients.clear()
+            self._http_clients.clear()
+            self._metrics.clear()
+        for client, async_client in http_clients:
+            client.close()
+            await async_client.aclose()
+
+
+model_registry = ModelClientRegistry()
+
+
+def get_chat_model(model: str = DEFAULT_CHAT_MODEL, temperature: float = 0.3, streaming: bool = True) -> ChatMistralAI:
+    """Get a shared, pooled ChatMistralAI client"""
+    return model_registry.get(model=model, temperature=temperature, streaming=streaming)
+
+
+def get_llm_pool_stats() -> dict:
+    """Pool metrics for every client created so far"""
+    return model_registry.stats()
@@ -1,14 +1,11 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, status, Depends
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException, status, Depends, Request, Response
+from fastapi.responses import StreamingResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel, EmailStr
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
-from langchain_classic.memory import ConversationBufferMemory
-from langchain_mistralai import ChatMistralAI
+from langchain_core.messages import SystemMessage, HumanMessage
 from langchain_mistralai import MistralAIEmbeddings
 from langchain_core.prompts import PromptTemplate
-from langchain_core.runnables import RunnableParallel
 from langchain_community.vectorstores import Chroma
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
@@ -16,25 +13,86 @@ from youtube_transcript_api import YouTubeTranscriptApi
 from langchain_community.document_loaders import WebBaseLoader
 from typing import Literal, Optional, List
 from langchain_community.document_loaders import PyPDFLoader
-from langchain_community.document_loaders import GithubFileLoader
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, func, tuple_
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 
+import asyncio
+import hashlib
 import time
 import os
 import tempfile
 import logging
-import queue
-import threading
+import itertools
+import bisect
+from pypdf import PdfReader
 from dotenv import load_dotenv, dotenv_values
 
-from .database import get_db, Base, engine
-from .models import User, Chat, Message
+from .database import get_db, get_read_db, get_pool_stats, Base, engine, SessionLocal, READ_REPLICA_ENABLED
+from .models import User, Chat, Message, IngestionJob
+from .llm import get_chat_model, get_llm_pool_stats, model_registry
+from .memory import create_memory_store, build_memory
+from .context_window import ContextWindow, CONTEXT_SUMMARY_ENABLED, estimate_tokens
+from .context_assembly import (
+    assemble_context,
+    format_history,
+    RAG_CONTEXT_TOKEN_BUDGET,
+    RAG_HISTORY_TOKEN_BUDGET,
+    RAG_CONDENSE_ENABLED,
+    RAG_CONDENSE_MODEL,
+    RAG_CONDENSE_TIMEOUT_SECONDS,
+)
+from .ingestion import ingest_documents, copy_collection, delete_paths
+from .pagination import page_size, encode_cursor, decode_cursor, CHATS_PAGE_SIZE, MESSAGES_PAGE_SIZE, NEXT_CURSOR_HEADER
+from .message_writer import message_writer, async_session, save_assistant_message, save_chat_title, MESSAGE_WRITE_BEHIND
+from .jobs import JobManager, JobContext, job_status, INGESTION_SPOOL_DIR
+from .embedding_cache import CachedEmbeddings, EMBEDDING_CACHE_ENABLED
+from .github_fetch import iter_repo_files, iter_files_at, compare_commits, GITHUB_FETCH_MODE
+from .code_chunks import split_repo_file, path_filter_clause
+from .pdf_extract import use_parallel_extraction, extract_pages_parallel, shutdown_pdf_pool, PDF_EXTRACT_WORKERS
+from .sources import (
+    youtube_source_key,
+    web_source_key,
+    pdf_source_key,
+    git_source_key,
+    extract_youtube_video_id,
+    parse_git_source_key,
+    resolve_github_commit,
+    sha256_file,
+    find_source,
+    find_source_by_collection,
+    register_source,
+    forget_source,
+    acquire_source,
+    release_collection,
+)
+from .bm25 import BM25Index, LEXICAL_INDEX_ENABLED, build_index, iter_collection_texts, lexical_index_path, load_lexical_index, delete_lexical_index
+from .retrieval import retrieve, fetch_documents, RAG_RETRIEVAL_MODE, RAG_TOP_K
+from .query_cache import CachedQueryEmbeddings, RetrievalCache, LRUCache, normalize_query
+from .response_cache import (
+    ResponseCache,
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_CHAT_TYPES,
+    hash_context,
+    replay_answer,
+    record_answer,
+)
+from .vector_cache import VectorStoreCache, CachedCollection, get_chroma_client, estimate_collection_bytes
+from .passwords import PasswordHashingBusy, get_hashing_stats, shutdown_hash_pool
 from .auth import (
-    get_password_hash,
-    verify_password,
+    hash_password,
+    check_password,
+    needs_rehash,
+    check_login_throttle,
+    record_login_failure,
+    record_login_success,
+    get_login_throttle_stats,
     create_access_token,
     get_current_user,
+    get_token_user,
+    get_user_cache_stats,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
 
@@ -106,6 +164,10 @@ except Exception as e:
 # Create database tables (only if database is available)
 try:
     Base.metadata.create_all(bind=engine)
+    # create_all skips tables that already exist, so add the pagination indexes to older databases
+    for table in (Chat.__table__, Message.__table__):
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
     logger.info("Database tables created successfully")
 except Exception as e:
     logger.warning(f"Could not create database tables. Database may not be available: {e}")
@@ -116,10 +178,16 @@ embedding_model = None
 try:
     embedding_model = MistralAIEmbeddings(model="mistral-embed", api_key=os.getenv("MISTRAL_API_KEY"))
     logger.info("Mistral embedding model initialized successfully")
+    if EMBEDDING_CACHE_ENABLED:
+        # Serve chunks that were already embedded (same video, page or repo) from the local cache
+        embedding_model = CachedEmbeddings(embedding_model, model_name="mistral-embed")
 except Exception as e:
     logger.warning(f"Could not initialize embedding model. MISTRAL_API_KEY may not be set: {e}")
     logger.warning("Server will start but RAG operations will fail until API key is configured.")
 
+# Retrieval embeds questions through a cache, so re-asked and regenerated questions skip the API
+query_embedding_model = CachedQueryEmbeddings(embedding_model, model_name="mistral-embed") if embedding_model is not None else None
+
 # Initialize FastAPI app
 app = FastAPI(title="RAG ChatBot API", version="2.0.0")
 
@@ -134,11 +202,24 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # ========== CONVERSATION MEMORY STORE ==========
-# Store ConversationBufferMemory instances per user for normal chats
-user_memories: dict[str, ConversationBufferMemory] = {}
+# Bounded cache of per-chat ContextWindow histories, rehydrated from the messages table on a miss
+memory_store = create_memory_store()
+
+# ========== VECTOR STORE CACHE ==========
+# Opened RAG collections and their lexical indexes, so follow-up questions skip the disk open
+vector_store_cache = VectorStoreCache()
+
+# ========== RETRIEVAL CACHE ==========
+# Chunk ids retrieved per (collection, question, k, mode), invalidated when a collection changes
+retrieval_cache = RetrievalCache()
+
+# ========== RESPONSE CACHE ==========
+# Opt-in: finished RAG answers replayed for the same question over the same retrieved context
+response_cache = ResponseCache() if RESPONSE_CACHE_ENABLED else None
 
 SYSTEM_MSG = SystemMessage(content="""
 You are an assistant whose top priorities are accuracy, clarity, and user safety. 
@@ -167,6 +248,10 @@ class ChatRequest(BaseModel):
     message: str
     chat_type: Literal['normal_chat', 'yt_chat', 'pdf_chat', 'web_chat', 'git_chat']
     vector_db_collection_id: Optional[str] = None
+    # git_chat only: restrict retrieval to one file or directory of the repository
+    path_filter: Optional[str] = None
+    # RAG chats only: "hybrid" (default), "vector", or "lexical" which skips the embedding call
+    retrieval_mode: Optional[Literal['hybrid', 'vector', 'lexical']] = None
 
 class ChatCreate(BaseModel):
     title: str
@@ -189,6 +274,11 @@ class MessageResponse(BaseModel):
 class RAGRequest(BaseModel):
     url: str
 
+# PDF uploads are copied to disk in blocks of this size
+UPLOAD_BLOCK_BYTES = 1024 * 1024
+# Pages read up front to estimate a PDF's length for chunk sizing
+PDF_SAMPLE_PAGES = 3
+
 # ========== UTILITY FUNCTIONS ==========
 def map_frontend_to_backend_chat_type(frontend_type: str) -> str:
     """Map frontend chat type to backend chat type"""
@@ -259,16 +349,12 @@ def extract_text_from_content(content):
     # Fallback: convert to string
     return str(content)
 
-def generate_title(user_query: str) -> str:
+async def generate_title(user_query: str) -> str:
     """Generate a concise title (max 5 words) based on user query"""
     try:
         logger.info("Generating title for user query")
-        model = ChatMistralAI(
-            model="mistral-small-latest",
-            temperature=0.3,
-            streaming=True,
-            api_key=os.getenv("MISTRAL_API_KEY"),
-        )
+        # The title is awaited whole, so a plain JSON response rather than an SSE stream
+        model = get_chat_model(model="mistral-small-latest", temperature=0.3, streaming=False)
         
         title_prompt = PromptTemplate(
             input_variables=["query"],
@@ -278,7 +364,7 @@ Title (max 5 words, no quotes, no punctuation at end):"""
         )
         
         chain = title_prompt | model
-        response = chain.invoke({"query": user_query})
+        response = await chain.ainvoke({"query": user_query})
         title = extract_text_from_content(response.content).strip()
         
         # Clean up title - remove quotes, limit to 5 words
@@ -292,57 +378,67 @@ Title (max 5 words, no quotes, no punctuation at end):"""
         logger.error(f"Error generating title: {str(e)}", exc_info=True)
         return "New Chat"
 
-def generate_title_parallel(user_query: str, title_queue: queue.Queue):
-    """Generate title in parallel thread for RunnableParallel execution"""
-    try:
-        title_model = ChatMistralAI(
-            model="mistral-small-latest",
-            temperature=0.3,
-            streaming=True,
-            api_key=os.getenv("MISTRAL_API_KEY"),
-        )
-        title_prompt = PromptTemplate(
-            input_variables=["query"],
-            template="""Generate a concise title (maximum 5 words) for a chat conversation based on this user query: "{query}"
+async def load_chat_memory(db: AsyncSession, chat_id: int, exclude_message_id: Optional[int] = None) -> ContextWindow:
+    """Rebuild a chat's ContextWindow from its stored messages"""
+    query = select(Message.role, Message.content).where(Message.chat_id == chat_id)
+    if exclude_message_id is not None:
+        query = query.where(Message.id != exclude_message_id)
+    result = await db.execute(query.order_by(Message.created_at.asc(), Message.id.asc()))
+    return build_memory(SYSTEM_MSG, result.all())
+
+async def get_chat_memory(db: AsyncSession, chat_id: int, stored_messages: int, exclude_message_id: Optional[int] = None) -> ContextWindow:
+    """A chat's ContextWindow from the memory store, reloaded from the database when missing or stale"""
+    memory = memory_store.get(chat_id)
+    if memory is not None and len(memory.messages) != stored_messages:
+        # Another worker has served this chat since it was cached, so the cached copy is stale
+        logger.info(f"Cached memory for chat {chat_id} is stale, reloading")
+        memory = None
+    if memory is None:
+        memory = await load_chat_memory(db, chat_id, exclude_message_id=exclude_message_id)
+        logger.info(f"Rehydrated context window for chat {chat_id} from {len(memory.messages)} stored messages")
+    return memory
+
+async def summarize_history(previous_summary: Optional[str], messages: list) -> str:
+    """Fold older turns into the rolling conversation summary"""
+    transcript = "\n".join(
+        f"{'User' if isinstance(message, HumanMessage) else 'Assistant'}: {extract_text_from_content(message.content)}"
+        for message in messages
+    )
+    summary_prompt = PromptTemplate(
+        input_variables=["summary", "transcript"],
+        template="""Update the running summary of a conversation with the new turns below.
+Keep names, facts, decisions and open questions. Reply with the summary only, in at most 200 words.
 
-Title (max 5 words, no quotes, no punctuation at end):"""
-        )
-        title_chain = title_prompt | title_model
-        
-        title_result = title_chain.invoke({"query": user_query})
-        title = extract_text_from_content(title_result.content).strip()
-        title = title.strip('"\'')
-        words = title.split()[:5]
-        title = " ".join(words) if words else "New Chat"
-        title_queue.put(title)
-        logger.info(f"Title generated in parallel: {title}")
+Current summary:
+{summary}
+
+New turns:
+{transcript}
+
+Updated summary:"""
+    )
+    try:
+        model = get_chat_model(model="mistral-small-latest", temperature=0.0, streaming=False)
+        response = await (summary_prompt | model).ainvoke({"summary": previous_summary or "(none)", "transcript": transcript})
+        return extract_text_from_content(response.content).strip()
     except Exception as e:
-        logger.error(f"Error generating title in parallel: {e}")
-        title_queue.put("New Chat")
+        logger.warning(f"Could not update conversation summary: {e}")
+        return ""
+
+# Keep references to fire-and-forget summary tasks so they are not garbage collected mid-flight
+summary_tasks: set = set()
 
-def stream_answer(memory: ConversationBufferMemory):
-    """Streams the assistant's reply token by token using ConversationBufferMemory"""
+async def stream_answer(chat_id: int, memory: ContextWindow):
+    """Streams the assistant's reply token by token from the chat's token-budgeted context window"""
     try:
-        logger.info("Initializing ChatMistralAI model")
-        model = ChatMistralAI(
-            model="mistral-small-latest",
-            temperature=0.3,
-            streaming=True,
-            api_key=os.getenv("MISTRAL_API_KEY"),
-        )
-        logger.info("Starting model stream with ConversationBufferMemory")
-        
-        # Get the conversation history from memory
-        history = memory.chat_memory.messages
-        # Ensure system message is at the beginning if not present
-        if not history or not isinstance(history[0], SystemMessage):
-            history = [SYSTEM_MSG] + history
+        model = get_chat_model(model="mistral-small-latest", temperature=0.3, streaming=True)
         
-        logger.info(f"History length: {len(history)}")
-        stream = model.stream(history)
+        # Only the newest turns that fit the token budget are sent to the model
+        history = memory.build_prompt()
+        logger.info(f"Prompt: {len(history)} of {len(memory.messages) + 1} messages, ~{memory.prompt_tokens()} tokens (budget {memory.token_budget})")
         full_response = ""
         token_count = 0
-        for chunk in stream:
+        async for chunk in model.astream(history):
             # Extract text from chunk content
             content = chunk.content if hasattr(chunk, 'content') else chunk
             token = extract_text_from_content(content)
@@ -352,23 +448,162 @@ def stream_answer(memory: ConversationBufferMemory):
                 token_count += 1
                 # Yield immediately for real-time streaming
                 yield token
-                # Small flush to ensure immediate transmission
-                import sys
-                sys.stdout.flush()
         
         logger.info(f"Model stream completed. Tokens received: {token_count}, Response length: {len(full_response)}")
         
-        # Save the AI response to memory using AIMessage
+        # Save the AI response to memory
         if full_response:
-            memory.chat_memory.add_ai_message(AIMessage(content=full_response))
-            logger.info("AI response saved to ConversationBufferMemory")
+            memory.add_ai_message(full_response)
+            memory_store.put(chat_id, memory)
+            logger.info("AI response saved to context window")
+            if CONTEXT_SUMMARY_ENABLED:
+                # Summarise turns that slid out of the window after the reply, so the next turn pays nothing
+                task = asyncio.create_task(memory.refresh_summary(summarize_history))
+                summary_tasks.add(task)
+                task.add_done_callback(summary_tasks.discard)
     except Exception as e:
         logger.error(f"Error in stream_answer: {str(e)}", exc_info=True)
         raise
 
+async def stream_chain(chain, prompt_input: dict):
+    """Streams text tokens from a prompt | model chain"""
+    async for token in chain.astream(prompt_input):
+        # Extract text from token content
+        content = token.content if hasattr(token, 'content') else token
+        token_content = extract_text_from_content(content)
+        if token_content:
+            yield token_content
+
+def remember_answer(chat_id: int, memory: ContextWindow, answer: str):
+    """Append a finished RAG answer to the chat's cached memory"""
+    if answer:
+        memory.add_ai_message(answer)
+        memory_store.put(chat_id, memory)
+
+# Condensed retrieval queries per (chat, history, question), so regenerating a turn does not condense it again
+condensed_queries = LRUCache(max_entries=5000)
+
+def history_before_retries(memory: ContextWindow, question: str) -> int:
+    """Index where the history for this question ends, skipping earlier attempts at the same question.
+
+    Regenerating an answer sends the same question again; the earlier
+    attempts (and their answers) must not count as conversation history.
+    """
+    messages = memory.messages
+    asked = normalize_query(question)
+    end = len(messages)
+    while end > 0:
+        if isinstance(messages[end - 1], HumanMessage) and normalize_query(str(messages[end - 1].content)) == asked:
+            end -= 1
+        elif end >= 2 and isinstance(messages[end - 2], HumanMessage) and normalize_query(str(messages[end - 2].content)) == asked:
+            end -= 2
+        else:
+            break
+    return end
+
+async def condense_question(chat_id: int, question: str, history_text: str) -> str:
+    """Rewrite a follow-up question into a standalone retrieval query using the conversation so far"""
+    key = (chat_id, hashlib.sha256(history_text.encode("utf-8")).hexdigest(), normalize_query(question))
+    cached = condensed_queries.get(key)
+    if cached is not None:
+        return cached
+
+    condense_prompt = PromptTemplate(
+        input_variables=["history", "question"],
+        template="""Given the conversation below and a follow-up question, rewrite the follow-up as a single standalone question that can be used to search the source documents.
+Resolve pronouns and references like "that" or "it" from the conversation. Keep names, identifiers and code symbols exactly. If the follow-up is already standalone, return it unchanged.
+Reply with the question only.
+
+Conversation:
+{history}
+
+Follow-up question: {question}
+
+Standalone question:"""
+    )
+    try:
+        model = get_chat_model(model=RAG_CONDENSE_MODEL, temperature=0.0, streaming=False)
+        response = await asyncio.wait_for(
+            (condense_prompt | model).ainvoke({"history": history_text, "question": question}),
+            timeout=RAG_CONDENSE_TIMEOUT_SECONDS,
+        )
+        condensed = extract_text_from_content(response.content).strip().strip('"') or question
+    except Exception as e:
+        logger.warning(f"Could not condense follow-up question, retrieving with it as asked: {e}")
+        return question
+    condensed_queries.put(key, condensed)
+    logger.info(f"Condensed follow-up question into: {condensed[:100]}")
+    return condensed
+
+async def stream_and_persist(token_stream, request: ChatRequest, is_first_message: bool):
+    """Relay a token stream to the client, then persist the title and assistant message.
+
+    On the first message of a chat the title is generated concurrently with the
+    answer and sent as a TITLE_UPDATE marker once the answer has finished.
+    Writes go through the message writer, so no database connection is held
+    while tokens are streaming.
+    """
+    full_response = ""
+    title_task = None
+    try:
+        if is_first_message:
+            logger.info("First message detected - generating title concurrently with response")
+            title_task = asyncio.create_task(generate_title(request.message))
+        
+        async for token in token_stream:
+            full_response += token
+            yield token
+        
+        logger.info(f"Stream completed. Response length: {len(full_response)}")
+        
+        if title_task is not None:
+            # Wait for title generation to complete (with timeout)
+            try:
+                generated_title = await asyncio.wait_for(title_task, timeout=10)
+            except asyncio.TimeoutError:
+                # Fallback if title generation timed out
+                logger.warning("Title generation timed out, retrying once")
+                generated_title = await generate_title(request.message)
+            title_task = None
+            logger.info(f"Generated title: {generated_title}")
+            
+            # Send title update immediately after streaming completes (before saving message)
+            if generated_title:
+                try:
+                    await save_chat_title(request.chat_id, generated_title)
+                    logger.info(f"Chat title updated to: {generated_title}")
+                    # Send title update as special marker (frontend will parse this)
+                    title_marker = f"<!-- TITLE_UPDATE:{generated_title} -->"
+                    yield title_marker
+                    logger.info(f"Title update marker sent: {title_marker}")
+                except Exception as e:
+                    logger.warning(f"Could not update chat title: {e}")
+        
+        # Save assistant message to database
+        try:
+            await save_assistant_message(request.chat_id, full_response)
+            logger.info("Assistant message saved to database")
+        except Exception as e:
+            logger.warning(f"Could not save assistant message to database: {e}")
+    except Exception as e:
+        logger.error(f"Error in stream generator: {str(e)}", exc_info=True)
+        error_msg = f"\n\nError: {str(e)}"
+        yield error_msg
+        # Try to save error message
+        try:
+            await save_assistant_message(request.chat_id, error_msg)
+        except Exception:
+            pass
+    finally:
+        if title_task is not None and not title_task.done():
+            title_task.cancel()
+
 def get_dynamic_chunk_size(text: str):
     """Dynamically decide chunk_size and chunk_overlap based on document length"""
-    length = len(text)
+    return get_dynamic_chunk_size_for_length(len(text))
+
+def get_dynamic_chunk_size_for_length(length: int):
+    """Chunk sizing rule behind get_dynamic_chunk_size, for when only the (estimated) length is known"""
     if length < 1000:
         chunk_size = length/2
         chunk_overlap = 20
@@ -391,7 +626,7 @@ def get_dynamic_chunk_size(text: str):
 
 def youtube_loader(url: str):
     """Load YouTube transcript"""
-    video_id = url.split("v=")[1].split("&")[0]
+    video_id = extract_youtube_video_id(url)
     ytt_api = YouTubeTranscriptApi()
     transcript_list = ytt_api.fetch(video_id)
     transcript = " ".join(chunk.text for chunk in transcript_list)
@@ -402,32 +637,20 @@ def load_pdf(file_path: str):
     loader = PyPDFLoader(file_path)
     return loader.lazy_load()
 
+def count_pdf_pages(file_path: str) -> Optional[int]:
+    """Page count from the PDF's page tree, without extracting any text"""
+    try:
+        return len(PdfReader(file_path).pages)
+    except Exception as e:
+        logger.warning(f"Could not count PDF pages: {e}")
+        return None
+
 def github_loader(repo_url, branch="main"):
-    """Load GitHub repository files"""
+    """Stream the supported files of a GitHub repository as (path, text) pairs"""
     repo_id = convert_github_url_to_repo_id(repo_url)
-    loader = GithubFileLoader(
-        repo=repo_id,
-        branch=branch,
-        file_filter=lambda file_path: file_path.endswith((
-            ".txt", ".md", ".html", ".css", ".xml", ".json", ".yaml", ".yml", 
-            ".py", ".js", ".ts", ".jsx", ".tsx", ".java", ".kt", ".kts", ".scala", 
-            ".c", ".cpp", ".h", ".hpp", ".rs", ".go", ".swift", ".m", ".php", 
-            ".rb", ".pl", ".pm", ".lua", ".sh", ".bash", ".r", ".jl", ".asm", 
-            ".s", ".dart", ".cs", ".ipynb"
-    )),
-        access_token=get_github_token(),
-    )
-    
     token_used = get_github_token()
-    logger.info(f"GitHub Loader using token: {token_used[:4]}...{token_used[-4:]} (Len: {len(token_used) if token_used else 0})")
-    
-    docs = loader.load()
-    full_text = ""
-    for i, doc in enumerate(docs, start=1):
-        file_name = doc.metadata.get("source", f"file_{i}")
-        full_text += f"\n\n===== FILE {i}: {file_name} =====\n"
-        full_text += doc.page_content
-    return full_text
+    logger.info(f"GitHub Loader using token: {token_used[:4] if token_used else None}... (Len: {len(token_used) if token_used else 0}), mode: {GITHUB_FETCH_MODE}")
+    return iter_repo_files(repo_id, branch, token_used)
 
 def convert_github_url_to_repo_id(github_url: str) -> str:
     """Converts any GitHub URL into owner/repo format"""
@@ -458,27 +681,190 @@ def split_text(text: str, chunk_size=None, chunk_overlap=None):
     chunks = splitter.split_text(text)
     return chunks
 
-def create_vector_store(chunks, collection_name: str, persist_dir: str):
-    """Create a Chroma vector store from chunks"""
-    docs = [Document(page_content=chunk) for chunk in chunks]
-    vector_store = Chroma(
+def split_text_stream(texts, chunk_size: int, chunk_overlap: int):
+    """Split a stream of text pieces (e.g. PDF pages) into chunks without joining them first.
+
+    Text is buffered until a few chunks' worth has accumulated; every chunk
+    except the last is emitted and the last one becomes the start of the next
+    buffer, so chunks still span piece boundaries with the usual overlap.
+    Yields (chunk, index of the piece the chunk starts in).
+    """
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap
+    )
+    flush_at = chunk_size * 4
+    buffer = ""
+    # (offset in buffer, piece index) where each buffered piece begins
+    starts = []
+
+    def locate(chunks):
+        located = []
+        search_from = 0
+        for chunk in chunks:
+            position = buffer.find(chunk, search_from)
+            if position == -1:
+                position = search_from
+            search_from = position + 1
+            piece = starts[bisect.bisect_right([offset for offset, _ in starts], position) - 1][1]
+            located.append((chunk, piece, position))
+        return located
+
+    for index, text in enumerate(texts):
+        if buffer:
+            buffer += "\n"
+        starts.append((len(buffer), index))
+        buffer += text
+        if len(buffer) < flush_at:
+            continue
+        located = locate(splitter.split_text(buffer))
+        for chunk, piece, _ in located[:-1]:
+            yield chunk, piece
+        if not located:
+            buffer, starts = "", []
+            continue
+        _, piece, position = located[-1]
+        buffer = buffer[position:]
+        starts = [(0, piece)] + [(offset - position, i) for offset, i in starts if offset > position]
+    if buffer.strip():
+        for chunk, piece, _ in locate(splitter.split_text(buffer)):
+            yield chunk, piece
+
+def create_vector_store(chunks, collection_name: str, persist_dir: str, progress=None):
+    """Create a Chroma vector store from text chunks or Documents using the batched embedding pipeline"""
+    # Plain text chunks carry their position in the source, which context assembly orders by
+    docs = (
+        chunk if isinstance(chunk, Document) else Document(page_content=chunk, metadata={"chunk_index": index})
+        for index, chunk in enumerate(chunks)
+    )
+    return ingest_documents(
+        docs,
         collection_name=collection_name,
-        embedding_function=embedding_model,
-        persist_directory=persist_dir
+        client=get_chroma_client(persist_dir),
+        embedding_model=embedding_model,
+        progress=progress
     )
-    vector_store.add_documents(docs)
-    vector_store.persist()
-    return vector_store
 
 def load_vector_store(collection_name: str, persist_dir: str):
     """Load an existing Chroma vector store"""
     vector_store = Chroma(
         collection_name=collection_name,
-        embedding_function=embedding_model,
-        persist_directory=persist_dir
+        embedding_function=query_embedding_model,
+        client=get_chroma_client(persist_dir)
     )
     return vector_store
 
+def build_lexical_index(collection_name: str, persist_dir: str) -> Optional[BM25Index]:
+    """Build and persist the BM25 index of a collection from the chunks stored in Chroma"""
+    if not LEXICAL_INDEX_ENABLED:
+        return None
+    try:
+        start = time.perf_counter()
+        collection = get_chroma_client(persist_dir).get_collection(collection_name)
+        index = build_index(iter_collection_texts(collection))
+        index.save(lexical_index_path(persist_dir, collection_name))
+        logger.info(f"Built lexical index for {collection_name}: {len(index)} chunks, {len(index.postings)} terms in {time.perf_counter() - start:.2f}s")
+        return index
+    except Exception as e:
+        # Retrieval falls back to vectors only, so a failed index never fails the ingestion
+        logger.warning(f"Could not build lexical index for {collection_name}: {e}")
+        return None
+
+def open_rag_collection(collection_name: str) -> CachedCollection:
+    """Open a persisted collection and its lexical index (called on a vector store cache miss)"""
+    vector_store = load_vector_store(collection_name=collection_name, persist_dir=os.getcwd())
+    lexical_index = load_lexical_index(os.getcwd(), collection_name) if LEXICAL_INDEX_ENABLED else None
+    if lexical_index is None:
+        # Collections ingested before lexical indexing get their index on first use
+        lexical_index = build_lexical_index(collection_name, persist_dir=os.getcwd())
+    return CachedCollection(vector_store, estimate_collection_bytes(vector_store), lexical_index)
+
+async def retrieve_context(collection_name: str, collection: CachedCollection, query: str, mode: str, where: Optional[dict] = None, chat_type: Optional[str] = None) -> list[Document]:
+    """Retrieve context chunks for a question, serving repeat questions from the retrieval cache"""
+    cached_ids = retrieval_cache.get(collection_name, query, RAG_TOP_K, mode, where)
+    if cached_ids is not None:
+        found = await run_in_threadpool(fetch_documents, collection.vector_store._collection, cached_ids)
+        if len(found) == len(cached_ids):
+            return [found[doc_id] for doc_id in cached_ids]
+        # Some chunks are gone, e.g. removed by a git sync in another worker
+        retrieval_cache.discard(collection_name, query, RAG_TOP_K, mode, where)
+
+    docs = await retrieve(collection, query, query_embedding_model, mode=mode, k=RAG_TOP_K, where=where, chat_type=chat_type)
+    ids = [doc.id for doc in docs]
+    if all(ids):
+        retrieval_cache.put(collection_name, query, RAG_TOP_K, mode, ids, where)
+    return docs
+
+async def cached_answer_stream(collection_name: str, question: str, context_text: str, token_stream, mode: str):
+    """Replay a cached answer for the same question and context, or record the live answer for next time.
+
+    Paraphrase matching needs a query embedding, so lexical-mode chats, which
+    never embed their queries, only get exact-question hits.
+    """
+    context_hash = hash_context([context_text])
+    query_embedding = None
+    if response_cache.similarity_threshold > 0 and mode != "lexical":
+        query_embedding = await query_embedding_model.aembed_query(question)
+    cached = response_cache.get(collection_name, context_hash, question, query_embedding)
+    if cached is not None:
+        logger.info(f"Serving cached answer for collection {collection_name} ({len(cached)} chars)")
+        await token_stream.aclose()
+        return replay_answer(cached)
+    return record_answer(
+        token_stream,
+        lambda answer: response_cache.put(collection_name, context_hash, question, answer, query_embedding),
+    )
+
+def delete_vector_store(collection_name: str, persist_dir: str):
+    """Delete a persisted collection and its lexical index, and drop any cached handle to it"""
+    vector_store_cache.invalidate(collection_name)
+    retrieval_cache.invalidate(collection_name)
+    if response_cache is not None:
+        response_cache.invalidate(collection_name)
+    delete_lexical_index(persist_dir, collection_name)
+    try:
+        get_chroma_client(persist_dir).delete_collection(collection_name)
+        logger.info(f"Deleted vector store collection: {collection_name}")
+    except Exception as e:
+        logger.warning(f"Could not delete vector store collection {collection_name}: {e}")
+
+def find_reusable_collection(source_key: str) -> Optional[str]:
+    """Collection already built from this exact source, if it still exists, with a reference taken for its next chat.
+
+    Uses its own short session: ingestion runs for minutes after this and
+    must not keep a pooled connection checked out meanwhile.
+    """
+    with SessionLocal() as db:
+        collection_name = acquire_source(db, source_key)
+    if collection_name is None:
+        return None
+    try:
+        get_chroma_client(os.getcwd()).get_collection(collection_name)
+    except Exception:
+        logger.warning(f"Registered collection {collection_name} for {source_key} is missing, re-ingesting")
+        with SessionLocal() as db:
+            source = find_source(db, source_key)
+            if source is not None and source.collection_name == collection_name:
+                forget_source(db, source)
+        return None
+    logger.info(f"Reusing collection {collection_name} for {source_key}")
+    return collection_name
+
+def publish_collection(source_key: str, source_type: str, collection_name: str) -> str:
+    """Register a new collection for its source; if a concurrent ingestion won, drop ours and use theirs.
+
+    Either way the returned collection carries a reference for its next chat.
+    """
+    with SessionLocal() as db:
+        registered = register_source(db, source_key, source_type, collection_name)
+    if registered is None:
+        logger.warning(f"{source_key} was registered concurrently but is no longer reusable, keeping {collection_name} unregistered")
+        return collection_name
+    if registered != collection_name:
+        logger.info(f"{source_key} was ingested concurrently, discarding duplicate collection {collection_name}")
+        delete_vector_store(collection_name, persist_dir=os.getcwd())
+    return registered
+
 def get_rag_prompt():
     """Get RAG prompt template"""
     prompt = PromptTemplate.from_template(
@@ -526,6 +912,9 @@ def get_rag_prompt():
     {context}
     =========================
 
+    CONVERSATION SO FAR (use it to understand the question; facts still come from the context):
+    {history}
+
     QUESTION:
     {question}
 
@@ -537,9 +926,17 @@ def get_rag_prompt():
 
 
 # ========== AUTHENTICATION ENDPOINTS ==========
+def hashing_busy_error() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-ins in progress, try again shortly",
+        headers={"Retry-After": "1"},
+    )
+
 @app.post("/auth/signup", response_model=Token)
-def signup(user_data: UserSignup, db: Session = Depends(get_db)):
+def signup(user_data: UserSignup, request: Request, db: Session = Depends(get_db)):
     """User registration"""
+    check_login_throttle(request)
     try:
         # Check if user already exists
         existing_user = db.query(User).filter(User.email == user_data.email).first()
@@ -550,7 +947,7 @@ def signup(user_data: UserSignup, db: Session = Depends(get_db)):
             )
         
         # Create new user
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = hash_password(user_data.password)
         new_user = User(email=user_data.email, password_hash=hashed_password)
         db.add(new_user)
         db.commit()
@@ -559,12 +956,15 @@ def signup(user_data: UserSignup, db: Session = Depends(get_db)):
         # Create access token
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            data={"sub": str(new_user.id)}, expires_delta=access_token_expires
+            data={"sub": str(new_user.id), "email": new_user.email}, expires_delta=access_token_expires
         )
         
         return {"access_token": access_token, "token_type": "bearer"}
     except HTTPException:
         raise
+    except PasswordHashingBusy as e:
+        logger.warning(f"Rejected signup: {e}")
+        raise hashing_busy_error()
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -573,24 +973,40 @@ def signup(user_data: UserSignup, db: Session = Depends(get_db)):
         )
 
 @app.post("/auth/signin", response_model=Token)
-def signin(user_data: UserSignin, db: Session = Depends(get_db)):
+def signin(user_data: UserSignin, request: Request, db: Session = Depends(get_db)):
     """User login"""
+    check_login_throttle(request, user_data.email)
     try:
         user = db.query(User).filter(User.email == user_data.email).first()
-        if not user or not verify_password(user_data.password, user.password_hash):
+        if not user or not check_password(user_data.password, user.password_hash):
+            record_login_failure(user_data.email)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password"
             )
+        record_login_success(user_data.email)
+        
+        if needs_rehash(user.password_hash):
+            # Move the stored hash to the configured bcrypt cost while the plain password is at hand
+            try:
+                user.password_hash = hash_password(user_data.password)
+                db.commit()
+                logger.info(f"Rehashed password for user {user.id} with the current bcrypt cost")
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Could not rehash password for user {user.id}: {e}")
         
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            data={"sub": str(user.id)}, expires_delta=access_token_expires
+            data={"sub": str(user.id), "email": user.email}, expires_delta=access_token_expires
         )
         
         return {"access_token": access_token, "token_type": "bearer"}
     except HTTPException:
         raise
+    except PasswordHashingBusy as e:
+        logger.warning(f"Rejected signin: {e}")
+        raise hashing_busy_error()
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -598,7 +1014,7 @@ def signin(user_data: UserSignin, db: Session = Depends(get_db)):
         )
 
 @app.get("/auth/me")
-def get_current_user_info(current_user: User = Depends(get_current_user)):
+def get_current_user_info(current_user: User = Depends(get_token_user)):
     """Get current user information"""
     try:
         return {
@@ -613,10 +1029,31 @@ def get_current_user_info(current_user: User = Depends(get_current_user)):
 
 # ========== CHAT MANAGEMENT ENDPOINTS ==========
 @app.get("/chats", response_model=List[ChatResponse])
-def get_chats(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    """Get all chats for current user"""
+def get_chats(
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """Get the current user's chats, newest first.
+
+    Without `limit` or `cursor` every chat is returned, as before. With either,
+    one page is returned; pass the X-Next-Cursor response header back as
+    `cursor` for the next one. Only the columns the chat list shows are loaded.
+    """
     try:
-        chats = db.query(Chat).filter(Chat.user_id == current_user.id).order_by(Chat.created_at.desc()).all()
+        query = db.query(Chat.id, Chat.title, Chat.type, Chat.vector_db_collection_id, Chat.created_at).filter(
+            Chat.user_id == current_user.id
+        )
+        if cursor:
+            query = query.filter(tuple_(Chat.created_at, Chat.id) < tuple_(*decode_cursor(cursor)))
+        query = query.order_by(Chat.created_at.desc(), Chat.id.desc())
+        size = page_size(limit, CHATS_PAGE_SIZE) if limit is not None or cursor else None
+        chats = query.limit(size + 1).all() if size is not None else query.all()
+        if size is not None and len(chats) > size:
+            chats = chats[:size]
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(chats[-1].created_at, chats[-1].id)
         return [
             ChatResponse(
                 id=chat.id,
@@ -629,6 +1066,8 @@ def get_chats(current_user: User = Depends(get_current_user), db: Session = Depe
         ]
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -646,6 +1085,8 @@ def create_chat(chat_data: ChatCreate, current_user: User = Depends(get_current_
             type=backend_type,
             vector_db_collection_id=chat_data.vector_db_collection_id
         )
+        # The RAG endpoint that returned the collection already took this chat's
+        # reference to it, so there is nothing to count here
         db.add(new_chat)
         db.commit()
         db.refresh(new_chat)
@@ -666,26 +1107,68 @@ def create_chat(chat_data: ChatCreate, current_user: User = Depends(get_current_
             detail=f"Failed to create chat: {str(e)}"
         )
 
+def list_chat_messages(db: Session, chat_id: int, user_id: int, size: Optional[int] = None, before: Optional[tuple] = None) -> Optional[tuple[List[MessageResponse], Optional[str]]]:
+    """One page of a chat's messages and the cursor of the page before it, or None if the user has no such chat.
+
+    Pages run backwards from the newest message (or from `before`), each
+    returned in chronological order, so the first page is the latest part
+    of the conversation. With no size, every message is returned.
+    """
+    chat = db.query(Chat.id).filter(Chat.id == chat_id, Chat.user_id == user_id).first()
+    if not chat:
+        return None
+    
+    query = db.query(Message.id, Message.role, Message.content, Message.created_at).filter(Message.chat_id == chat_id)
+    if before is not None:
+        query = query.filter(tuple_(Message.created_at, Message.id) < tuple_(*before))
+    query = query.order_by(Message.created_at.desc(), Message.id.desc())
+    messages = query.limit(size + 1).all() if size is not None else query.all()
+    next_cursor = None
+    if size is not None and len(messages) > size:
+        messages = messages[:size]
+        next_cursor = encode_cursor(messages[-1].created_at, messages[-1].id)
+    messages.reverse()
+    return [
+        MessageResponse(
+            id=msg.id,
+            role=msg.role,
+            content=msg.content,
+            created_at=msg.created_at.isoformat()
+        )
+        for msg in messages
+    ], next_cursor
+
 @app.get("/chats/{chat_id}/messages", response_model=List[MessageResponse])
-def get_chat_messages(chat_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    """Get messages for a specific chat"""
+def get_chat_messages(
+    chat_id: int,
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """Get messages for a specific chat; all of them unless `limit` or `cursor` asks for a page.
+
+    Pages start at the latest messages and X-Next-Cursor pages back to older ones.
+    """
     try:
-        chat = db.query(Chat).filter(Chat.id == chat_id, Chat.user_id == current_user.id).first()
-        if not chat:
+        before = decode_cursor(cursor) if cursor else None
+        size = page_size(limit, MESSAGES_PAGE_SIZE) if limit is not None or cursor else None
+        page = list_chat_messages(db, chat_id, current_user.id, size, before)
+        if page is None and READ_REPLICA_ENABLED:
+            # A chat created moments ago may not have reached the replica yet
+            with SessionLocal() as primary:
+                page = list_chat_messages(primary, chat_id, current_user.id, size, before)
+        if page is None:
             raise HTTPException(status_code=404, detail="Chat not found")
-        
-        messages = db.query(Message).filter(Message.chat_id == chat_id).order_by(Message.created_at.asc()).all()
-        return [
-            MessageResponse(
-                id=msg.id,
-                role=msg.role,
-                content=msg.content,
-                created_at=msg.created_at.isoformat()
-            )
-            for msg in messages
-        ]
+        messages, next_cursor = page
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return messages
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -700,8 +1183,19 @@ def delete_chat(chat_id: int, current_user: User = Depends(get_current_user), db
         if not chat:
             raise HTTPException(status_code=404, detail="Chat not found")
         
+        collection_name = chat.vector_db_collection_id
+        released = release_collection(db, collection_name) if collection_name else None
         db.delete(chat)
         db.commit()
+        memory_store.delete(chat_id)
+        
+        # Drop the chat's collection once no other chat uses it
+        if collection_name:
+            if released is None:
+                # Collection predates the source registry, so count references directly
+                released = db.query(Chat).filter(Chat.vector_db_collection_id == collection_name).count() == 0
+            if released:
+                delete_vector_store(collection_name, persist_dir=os.getcwd())
         return {"status": "deleted"}
     except HTTPException:
         raise
@@ -713,33 +1207,52 @@ def delete_chat(chat_id: int, current_user: User = Depends(get_current_user), db
         )
 
 # ========== CHAT STREAMING ENDPOINT ==========
+STREAM_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"  # Disable nginx buffering
+}
+
 @app.post("/chat/stream")
-async def chat_stream(request: ChatRequest, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def chat_stream(request: ChatRequest, current_user: User = Depends(get_token_user)):
     """Streaming chat endpoint"""
     logger.info(f"Received chat stream request: chat_id={request.chat_id}, chat_type={request.chat_type}, user_id={current_user.id}")
     try:
-        # Verify chat belongs to user
-        chat = db.query(Chat).filter(Chat.id == request.chat_id, Chat.user_id == current_user.id).first()
-        if not chat:
-            logger.warning(f"Chat not found: chat_id={request.chat_id}, user_id={current_user.id}")
-            raise HTTPException(status_code=404, detail="Chat not found")
+        # A reply from the previous turn may still be queued; count and load history only once it is stored
+        await message_writer.wait_for_chat(request.chat_id)
         
-        logger.info(f"Chat found: {chat.title}")
-        
-        # Check if this is the first message in the chat (before saving user message)
-        existing_messages = db.query(Message).filter(Message.chat_id == request.chat_id).count()
-        is_first_message = existing_messages == 0
-        logger.info(f"Is first message: {is_first_message}, existing messages: {existing_messages}")
-        
-        # Save user message (if database is available)
-        try:
-            user_message = Message(chat_id=request.chat_id, role="user", content=request.message)
-            db.add(user_message)
-            db.commit()
-            logger.info(f"User message saved: {request.message[:50]}...")
-        except Exception as e:
-            db.rollback()
-            logger.warning(f"Could not save user message to database: {e}")
+        # Everything that needs the database happens in this short session, which is
+        # closed before any LLM call so no connection is held for the length of a stream
+        async with async_session() as db:
+            # Verify chat belongs to user
+            result = await db.execute(select(Chat).where(Chat.id == request.chat_id, Chat.user_id == current_user.id))
+            chat = result.scalar_one_or_none()
+            if not chat:
+                logger.warning(f"Chat not found: chat_id={request.chat_id}, user_id={current_user.id}")
+                raise HTTPException(status_code=404, detail="Chat not found")
+            
+            logger.info(f"Chat found: {chat.title}")
+            
+            # Check if this is the first message in the chat (before saving user message)
+            existing_messages = await db.scalar(
+                select(func.count()).select_from(Message).where(Message.chat_id == request.chat_id)
+            )
+            is_first_message = existing_messages == 0
+            logger.info(f"Is first message: {is_first_message}, existing messages: {existing_messages}")
+            
+            # Save user message (if database is available)
+            user_message_id = None
+            try:
+                user_message = Message(chat_id=request.chat_id, role="user", content=request.message)
+                db.add(user_message)
+                await db.commit()
+                user_message_id = user_message.id
+                logger.info(f"User message saved: {request.message[:50]}...")
+            except Exception as e:
+                await db.rollback()
+                logger.warning(f"Could not save user message to database: {e}")
+            
+            # Get this chat's ContextWindow from the store (or rebuild it from the database)
+            memory = await get_chat_memory(db, request.chat_id, existing_messages, exclude_message_id=user_message_id)
     except HTTPException:
         raise
     except Exception as e:
@@ -750,119 +1263,18 @@ async def chat_stream(request: ChatRequest, current_user: User = Depends(get_cur
         )
     
     if request.chat_type == "normal_chat":
-        # Memory-based chat using ConversationBufferMemory
-        logger.info("Processing normal_chat request with ConversationBufferMemory")
-        user_id_str = str(current_user.id)
-        
-        # is_first_message is already determined above before saving user message
+        # Memory-based chat using a token-budgeted context window
+        logger.info("Processing normal_chat request with ContextWindow memory")
         
-        # Get or create ConversationBufferMemory for this user
-        if user_id_str not in user_memories:
-            user_memories[user_id_str] = ConversationBufferMemory(
-                return_messages=True,
-                memory_key="chat_memory"
-            )
-            # Add system message to memory as SystemMessage
-            user_memories[user_id_str].chat_memory.add_message(SYSTEM_MSG)
-            logger.info(f"Initialized ConversationBufferMemory for user: {user_id_str}")
+        # Add user message to memory
+        memory.add_user_message(request.message)
+        memory_store.put(request.chat_id, memory)
+        logger.info(f"Added user message to memory. Total messages: {len(memory.messages)}, total tokens: {memory.total_tokens}")
 
-        memory = user_memories[user_id_str]
-        
-        # Add user message to memory using HumanMessage
-        memory.chat_memory.add_user_message(HumanMessage(content=request.message))
-        logger.info(f"Added user message to memory. Total messages: {len(memory.chat_memory.messages)}")
-
-        def generate():
-            full_response = ""
-            generated_title = None
-            
-            try:
-                if is_first_message:
-                    # Use RunnableParallel for first message: generate response and title in parallel
-                    logger.info("First message detected - using RunnableParallel for response and title generation")
-                    
-                    # Queue to store title result
-                    title_queue = queue.Queue()
-                    
-                    # Start title generation in background thread using module-level function
-                    title_thread = threading.Thread(target=generate_title_parallel, args=(request.message, title_queue))
-                    title_thread.start()
-                    
-                    # Stream response while title is being generated in parallel
-                    logger.info("Starting stream_answer generator with ConversationBufferMemory")
-                    token_count = 0
-                    for token in stream_answer(memory):
-                        if token:
-                            full_response += token
-                            token_count += 1
-                            yield token
-                    
-                    # Wait for title generation to complete (with timeout)
-                    title_thread.join(timeout=10)
-                    if not title_queue.empty():
-                        generated_title = title_queue.get()
-                    else:
-                        # Fallback if title generation failed or timed out
-                        generated_title = generate_title(request.message)
-                        logger.warning("Title generation timed out or failed, using fallback")
-                    
-                    logger.info(f"Generated title: {generated_title}")
-                    
-                    # Send title update immediately after streaming completes (before saving message)
-                    if generated_title:
-                        try:
-                            # Refresh chat object to ensure we have the latest data
-                            db.refresh(chat)
-                            chat.title = generated_title
-                            db.commit()
-                            logger.info(f"Chat title updated to: {generated_title}")
-                            # Send title update as special marker (frontend will parse this)
-                            title_marker = f"<!-- TITLE_UPDATE:{generated_title} -->"
-                            yield title_marker
-                            logger.info(f"Title update marker sent: {title_marker}")
-                        except Exception as e:
-                            db.rollback()
-                            logger.warning(f"Could not update chat title: {e}")
-                else:
-                    # Regular streaming for subsequent messages
-                    logger.info("Starting stream_answer generator with ConversationBufferMemory")
-                    token_count = 0
-                    for token in stream_answer(memory):
-                        if token:
-                            full_response += token
-                            token_count += 1
-                            yield token
-                
-                logger.info(f"Stream completed. Response length: {len(full_response)}")
-                
-                # Save assistant message to database
-                try:
-                    assistant_message = Message(chat_id=request.chat_id, role="assistant", content=full_response)
-                    db.add(assistant_message)
-                    db.commit()
-                    logger.info("Assistant message saved to database")
-                except Exception as e:
-                    db.rollback()
-                    logger.warning(f"Could not save assistant message to database: {e}")
-            except Exception as e:
-                logger.error(f"Error in stream generator: {str(e)}", exc_info=True)
-                error_msg = f"\n\nError: {str(e)}"
-                yield error_msg
-                # Try to save error message
-                try:
-                    assistant_message = Message(chat_id=request.chat_id, role="assistant", content=error_msg)
-                    db.add(assistant_message)
-                    db.commit()
-                except:
-                    db.rollback()
-        
         return StreamingResponse(
-            generate(), 
+            stream_and_persist(stream_answer(request.chat_id, memory), request, is_first_message),
             media_type="text/plain",
-            headers={
-                "Cache-Control": "no-cache",
-                "X-Accel-Buffering": "no"  # Disable nginx buffering
-            }
+            headers=STREAM_HEADERS
         )
     
     elif request.chat_type in ["yt_chat", "pdf_chat", "web_chat", "git_chat"]:
@@ -872,165 +1284,339 @@ async def chat_stream(request: ChatRequest, current_user: User = Depends(get_cur
             logger.warning("vector_db_collection_id required for RAG chats")
             raise HTTPException(status_code=400, detail="vector_db_collection_id required for RAG chats")
         
-        # Check if this is the first message in the chat (same check as normal_chat)
-        # is_first_message is already determined above before saving user message
-        
-        current_dir = os.getcwd()
         try:
             logger.info(f"Loading vector store: {request.vector_db_collection_id}")
-            vector_store = load_vector_store(
-                collection_name=request.vector_db_collection_id,
-                persist_dir=current_dir
+            collection = await run_in_threadpool(
+                vector_store_cache.get,
+                request.vector_db_collection_id,
+                open_rag_collection
             )
             logger.info("Vector store loaded successfully")
         except Exception as e:
             logger.error(f"Vector store not found: {e}", exc_info=True)
             raise HTTPException(status_code=404, detail=f"Vector store not found: {e}")
 
-        logger.info("Creating retriever and retrieving context")
-        retriever = vector_store.as_retriever(search_type="mmr", search_kwargs={"k": 5})
-        context_docs = retriever.invoke(request.message)
-        context_text = "\n".join(doc.page_content for doc in context_docs)
-        logger.info(f"Retrieved {len(context_docs)} context documents, total length: {len(context_text)}")
+        # Earlier turns give follow-ups their meaning, both for retrieval and for the answer
+        history = memory.recent_turns(RAG_HISTORY_TOKEN_BUDGET, end=history_before_retries(memory, request.message))
+        history_text = format_history(history)
+        memory.add_user_message(request.message)
+        memory_store.put(request.chat_id, memory)
+
+        retrieval_query = request.message
+        if history and RAG_CONDENSE_ENABLED:
+            retrieval_query = await condense_question(request.chat_id, request.message, history_text)
+
+        logger.info("Retrieving context")
+        retrieval_mode = request.retrieval_mode or RAG_RETRIEVAL_MODE
+        context_docs = await retrieve_context(
+            request.vector_db_collection_id,
+            collection,
+            retrieval_query,
+            mode=retrieval_mode,
+            where=path_filter_clause(request.path_filter) if request.path_filter else None,
+            chat_type=request.chat_type,
+        )
+        context = assemble_context(context_docs)
+        context_text = context.text
 
         rag_prompt = get_rag_prompt()
-        logger.info("Initializing ChatMistralAI for RAG")
-        llm = ChatMistralAI(
-            model="mistral-small-latest",
-            temperature=0.3,
-            streaming=True,
-            api_key=os.getenv("MISTRAL_API_KEY"),
-        )
+        llm = get_chat_model(model="mistral-small-latest", temperature=0.3, streaming=True)
         
         chain = rag_prompt | llm
-        prompt_input = {'context': context_text, 'question': request.message}
-        
-        def generate():
-            full_response = ""
-            generated_title = None
-            
-            try:
-                if is_first_message:
-                    # Use RunnableParallel for first message: generate response and title in parallel
-                    logger.info("First message detected in RAG chat - using RunnableParallel for response and title generation")
-                    
-                    import threading
-                    import queue
-                    
-                    # Queue to store title result
-                    title_queue = queue.Queue()
-                    
-                    # Start title generation in background thread
-                    title_thread = threading.Thread(target=generate_title_parallel, args=(request.message, title_queue))
-                    title_thread.start()
-                    
-                    # Stream RAG response while title is being generated in parallel
-                    logger.info("Starting RAG chain stream with parallel title generation")
-                    token_count = 0
-                    for token in chain.stream(prompt_input):
-                        # Extract text from token content
-                        content = token.content if hasattr(token, 'content') else token
-                        token_content = extract_text_from_content(content)
-                        
-                        if token_content:
-                            full_response += token_content
-                            token_count += 1
-                            yield token_content
-                    
-                    # Wait for title generation to complete (with timeout)
-                    title_thread.join(timeout=10)
-                    if not title_queue.empty():
-                        generated_title = title_queue.get()
-                    else:
-                        # Fallback if title generation failed or timed out
-                        generated_title = generate_title(request.message)
-                        logger.warning("Title generation timed out or failed, using fallback")
-                    
-                    logger.info(f"Generated title for RAG chat: {generated_title}")
-                    
-                    # Send title update immediately after streaming completes (before saving message)
-                    if generated_title:
-                        try:
-                            # Refresh chat object to ensure we have the latest data
-                            db.refresh(chat)
-                            chat.title = generated_title
-                            db.commit()
-                            logger.info(f"RAG chat title updated to: {generated_title}")
-                            # Send title update as special marker (frontend will parse this)
-                            title_marker = f"<!-- TITLE_UPDATE:{generated_title} -->"
-                            yield title_marker
-                            logger.info(f"Title update marker sent for RAG chat: {title_marker}")
-                        except Exception as e:
-                            db.rollback()
-                            logger.warning(f"Could not update RAG chat title: {e}")
-                else:
-                    # Regular streaming for subsequent messages
-                    logger.info("Starting RAG chain stream")
-                    token_count = 0
-                    for token in chain.stream(prompt_input):
-                        # Extract text from token content
-                        content = token.content if hasattr(token, 'content') else token
-                        token_content = extract_text_from_content(content)
-                        
-                        if token_content:
-                            full_response += token_content
-                            token_count += 1
-                            yield token_content
-                
-                logger.info(f"RAG stream completed. Response length: {len(full_response)}")
-                
-                # Save assistant message (if database is available)
-                try:
-                    assistant_message = Message(chat_id=request.chat_id, role="assistant", content=full_response)
-                    db.add(assistant_message)
-                    db.commit()
-                    logger.info("RAG assistant message saved to database")
-                except Exception as e:
-                    db.rollback()
-                    logger.warning(f"Could not save assistant message to database: {e}")
-            except Exception as e:
-                logger.error(f"Error in RAG stream generator: {str(e)}", exc_info=True)
-                error_msg = f"\n\nError: {str(e)}"
-                yield error_msg
-                # Try to save error message
-                try:
-                    assistant_message = Message(chat_id=request.chat_id, role="assistant", content=error_msg)
-                    db.add(assistant_message)
-                    db.commit()
-                except:
-                    db.rollback()
+        prompt_input = {'context': context_text, 'history': history_text or "(none)", 'question': request.message}
+        prompt_text = rag_prompt.format(**prompt_input)
+        logger.info(
+            f"RAG context: {context.chunks_used}/{context.chunks_in} chunks "
+            f"({context.merged} merged, {context.duplicates} duplicate{', truncated' if context.truncated else ''}), "
+            f"{context.tokens} tokens of {RAG_CONTEXT_TOKEN_BUDGET} budget; "
+            f"history {len(history)} messages; "
+            f"prompt {len(prompt_text)} chars, ~{estimate_tokens(prompt_text)} tokens"
+        )
+        token_stream = stream_chain(chain, prompt_input)
+        # Answers to follow-ups depend on the conversation, so only standalone questions are shared
+        if response_cache is not None and request.chat_type in RESPONSE_CACHE_CHAT_TYPES and not history:
+            token_stream = await cached_answer_stream(request.vector_db_collection_id, request.message, context_text, token_stream, retrieval_mode)
+        token_stream = record_answer(token_stream, lambda answer: remember_answer(request.chat_id, memory, answer))
         
         return StreamingResponse(
-            generate(), 
+            stream_and_persist(token_stream, request, is_first_message),
             media_type="text/plain",
-            headers={
-                "Cache-Control": "no-cache",
-                "X-Accel-Buffering": "no"  # Disable nginx buffering
-            }
+            headers=STREAM_HEADERS
         )
 
     else:
         raise HTTPException(status_code=400, detail="Invalid chat_type")
 
+# ========== INGESTION ==========
+def embed_into_new_collection(chunks, user_id: int, job: JobContext, estimated_total: Optional[int] = None) -> str:
+    """Embed chunks into a fresh collection, removing it again if embedding fails or is cancelled.
+
+    chunks may be a lazy iterator, in which case estimated_total drives the progress ETA.
+    """
+    current_millis = int(time.time() * 1000)
+    collection_name = f"{user_id}_{current_millis}"
+    job.total(len(chunks) if isinstance(chunks, list) else estimated_total)
+    job.stage("embedding")
+    try:
+        written = create_vector_store(chunks, collection_name=collection_name, persist_dir=os.getcwd(), progress=job.progress)
+    except BaseException:
+        delete_vector_store(collection_name, persist_dir=os.getcwd())
+        raise
+    if not written:
+        delete_vector_store(collection_name, persist_dir=os.getcwd())
+        raise HTTPException(status_code=400, detail="No text could be extracted from the source")
+    job.stage("indexing")
+    build_lexical_index(collection_name, persist_dir=os.getcwd())
+    job.total(written)
+    return collection_name
+
+def ingest_youtube(url: str, user_id: int, job: JobContext) -> str:
+    """Fetch, split and embed a YouTube transcript; returns the collection name"""
+    source_key = youtube_source_key(url)
+    existing_collection = find_reusable_collection(source_key)
+    if existing_collection:
+        return existing_collection
+    
+    job.stage("fetching")
+    transcript = youtube_loader(url)
+    if not transcript or transcript.strip() == "":
+        logger.warning(f"Empty transcript extracted from YouTube URL: {url}")
+        raise HTTPException(status_code=400, detail="Could not extract transcript from YouTube video. Please check if the video has captions enabled.")
+    
+    job.stage("splitting")
+    chunk_size, chunk_overlap = get_dynamic_chunk_size(transcript)
+    split_documents = split_text(transcript, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    collection_name = embed_into_new_collection(split_documents, user_id, job)
+    collection_name = publish_collection(source_key, "yt", collection_name)
+    logger.info(f"Successfully created YouTube RAG collection: {collection_name}")
+    return collection_name
+
+def ingest_github(url: str, user_id: int, job: JobContext) -> str:
+    """Fetch, split and embed a GitHub repository; returns the collection name"""
+    repo_id = convert_github_url_to_repo_id(url)
+    # Pin the ingestion to the branch's current commit so identical snapshots can be shared
+    commit_sha = resolve_github_commit(repo_id, "main", get_github_token())
+    source_key = git_source_key(repo_id, commit_sha) if commit_sha else None
+    if source_key:
+        existing_collection = find_reusable_collection(source_key)
+        if existing_collection:
+            return existing_collection
+    
+    job.stage("fetching")
+    files = iter(github_loader(url, branch=commit_sha or "main"))
+    first_file = next(files, None)
+    if first_file is None:
+        logger.warning(f"No files found in Git repository: {url}")
+        raise HTTPException(status_code=400, detail="Could not access Git repository or repository is empty. Please check the URL and ensure the repository is public or accessible.")
+    
+    job.stage("splitting")
+    # Each file is split on its own with a splitter for its language, as it arrives
+    split_documents = (
+        document
+        for path, text in itertools.chain([first_file], files)
+        for document in split_repo_file(path, text)
+    )
+    collection_name = embed_into_new_collection(split_documents, user_id, job)
+    if source_key:
+        collection_name = publish_collection(source_key, "git", collection_name)
+    logger.info(f"Successfully created Git RAG collection: {collection_name}")
+    return collection_name
+
+def switch_chat_collection(db: Session, chat: Chat, collection_name: str):
+    """Point a chat at another collection and drop the old one if nothing else uses it.
+
+    collection_name comes from find_reusable_collection or publish_collection,
+    so the chat's reference to it is already counted.
+    """
+    old_collection = chat.vector_db_collection_id
+    if old_collection == collection_name:
+        # The chat already holds a reference; give back the one taken for the switch
+        release_collection(db, collection_name)
+        db.commit()
+        return
+    released = release_collection(db, old_collection) if old_collection else None
+    chat.vector_db_collection_id = collection_name
+    db.commit()
+    if old_collection:
+        if released is None:
+            released = db.query(Chat).filter(Chat.vector_db_collection_id == old_collection).count() == 0
+        if released:
+            delete_vector_store(old_collection, persist_dir=os.getcwd())
+
+def has_path_metadata(collection_name: str) -> bool:
+    """True if a collection was chunked per file, which incremental updates rely on"""
+    sample = get_chroma_client(os.getcwd()).get_collection(collection_name).get(limit=1, include=["metadatas"])
+    return bool(sample["metadatas"]) and bool((sample["metadatas"][0] or {}).get("path"))
+
+def switch_chat_to(chat_id: int, collection_name: str):
+    """switch_chat_collection in a short session of its own"""
+    with SessionLocal() as db:
+        chat = db.query(Chat).filter(Chat.id == chat_id).first()
+        if chat is not None:
+            switch_chat_collection(db, chat, collection_name)
+            return
+        # The chat was deleted while syncing: give back the reference taken for it
+        released = release_collection(db, collection_name)
+        db.commit()
+    if released:
+        delete_vector_store(collection_name, persist_dir=os.getcwd())
+
+def sync_github(chat_id: int, user_id: int, job: JobContext) -> dict:
+    """Bring a git_chat's collection up to the branch head, re-embedding only files changed since its commit.
+
+    The database is only touched in short sessions before and after the
+    fetching and embedding, never held open across them.
+    """
+    with SessionLocal() as db:
+        chat = db.query(Chat).filter(Chat.id == chat_id, Chat.user_id == user_id).first()
+        if not chat or chat.type != "git_chat" or not chat.vector_db_collection_id:
+            raise HTTPException(status_code=404, detail="Git chat not found")
+        collection_name = chat.vector_db_collection_id
+        source = find_source_by_collection(db, collection_name)
+        pinned = parse_git_source_key(source.source_key) if source else None
+    if pinned is None:
+        raise HTTPException(status_code=409, detail="This repository was ingested before commit tracking. Please ingest it again through /git_rag.")
+    repo_id, base_sha = pinned
+
+    token = get_github_token()
+    head_sha = resolve_github_commit(repo_id, "main", token)
+    if not head_sha:
+        raise HTTPException(status_code=502, detail="Could not resolve the repository's current commit")
+    if head_sha == base_sha:
+        return {"collection_name": collection_name, "commit": head_sha, "mode": "unchanged", "files_changed": 0}
+
+    head_key = git_source_key(repo_id, head_sha)
+    existing_collection = find_reusable_collection(head_key)
+    if existing_collection:
+        switch_chat_to(chat_id, existing_collection)
+        return {"collection_name": existing_collection, "commit": head_sha, "mode": "reused", "files_changed": 0}
+
+    job.stage("fetching")
+    diff = compare_commits(repo_id, base_sha, head_sha, token) if has_path_metadata(collection_name) else None
+    if diff is None:
+        # Too large a diff, an unrelated history or a pre-per-file collection: rebuild from scratch
+        new_collection = ingest_github(f"https://github.com/{repo_id}", user_id, job)
+        switch_chat_to(chat_id, new_collection)
+        return {"collection_name": new_collection, "commit": head_sha, "mode": "full", "files_changed": None}
+    changed_paths, stale_paths = diff
+    logger.info(f"Syncing {repo_id} {base_sha[:7]}...{head_sha[:7]}: {len(changed_paths)} files to embed, {len(stale_paths)} to drop")
+
+    # Always update a copy and swap it in once complete: the chat keeps a consistent snapshot
+    # at its recorded commit if anything fails, and a retry starts again from that snapshot.
+    # Stored vectors are copied as they are, so only changed files are embedded.
+    client = get_chroma_client(os.getcwd())
+    target_collection = f"{user_id}_{int(time.time() * 1000)}"
+    try:
+        copy_collection(client, collection_name, target_collection)
+        job.stage("splitting")
+        # Every path about to be written loses its old chunks too, not only modified and removed ones
+        delete_paths(client.get_collection(target_collection), sorted(set(stale_paths) | set(changed_paths)))
+        documents = (
+            document
+            for path, text in iter_files_at(repo_id, head_sha, changed_paths, token)
+            for document in split_repo_file(path, text)
+        )
+        job.stage("embedding")
+        written = ingest_documents(documents, collection_name=target_collection, client=client, embedding_model=embedding_model, progress=job.progress)
+        build_lexical_index(target_collection, persist_dir=os.getcwd())
+    except BaseException:
+        delete_vector_store(target_collection, persist_dir=os.getcwd())
+        raise
+
+    # The commit only advances here, after every write succeeded; the old snapshot is
+    # dropped by switch_chat_collection once no other chat uses it
+    target_collection = publish_collection(head_key, "git", target_collection)
+    switch_chat_to(chat_id, target_collection)
+    logger.info(f"Synced {repo_id} to {head_sha[:7]} in {target_collection}: {written} chunks embedded")
+    return {"collection_name": target_collection, "commit": head_sha, "mode": "incremental", "files_changed": len(set(changed_paths) | set(stale_paths))}
+
+def ingest_pdf(path: str, user_id: int, job: JobContext, content_sha256: Optional[str] = None) -> str:
+    """Parse, split and embed a PDF stored at path; returns the collection name.
+
+    Pages are extracted, split and embedded as a stream, so memory use does
+    not grow with the size of the PDF.
+    """
+    source_key = pdf_source_key(content_sha256 or sha256_file(path))
+    existing_collection = find_reusable_collection(source_key)
+    if existing_collection:
+        return existing_collection
+
+    job.stage("fetching")
+    page_count = count_pdf_pages(path)
+    if use_parallel_extraction(page_count):
+        logger.info(f"Extracting {page_count} PDF pages across {PDF_EXTRACT_WORKERS} processes")
+        pages = extract_pages_parallel(path, page_count)
+    else:
+        pages = (doc.page_content for doc in load_pdf(path))
+    # Chunk sizing depends on document length, so estimate it from the first pages
+    sample = list(itertools.islice(pages, PDF_SAMPLE_PAGES))
+    if not sample:
+        raise HTTPException(status_code=400, detail="Could not load or parse PDF")
+    total_pages = page_count or len(sample)
+    estimated_length = int(sum(len(text) for text in sample) / len(sample) * total_pages)
+    chunk_size, chunk_overlap = get_dynamic_chunk_size_for_length(max(estimated_length, 1))
+    logger.info(f"PDF has {total_pages} pages, ~{estimated_length} chars; chunk_size={chunk_size}, overlap={chunk_overlap}")
+
+    job.stage("splitting")
+    chunks = (
+        Document(page_content=chunk, metadata={"page": page + 1, "chunk_index": index})
+        for index, (chunk, page) in enumerate(
+            split_text_stream(itertools.chain(sample, pages), chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        )
+    )
+    estimated_chunks = estimated_length // max(chunk_size - chunk_overlap, 1) + 1
+    collection_name = embed_into_new_collection(chunks, user_id, job, estimated_total=estimated_chunks)
+    collection_name = publish_collection(source_key, "pdf", collection_name)
+    logger.info(f"Successfully created PDF RAG collection: {collection_name}")
+    return collection_name
+
+def ingest_web(url: str, user_id: int, job: JobContext) -> str:
+    """Fetch, split and embed a webpage; returns the collection name"""
+    source_key = web_source_key(url)
+    existing_collection = find_reusable_collection(source_key)
+    if existing_collection:
+        return existing_collection
+    
+    job.stage("fetching")
+    webpage_text = web_loader(url)
+    if not webpage_text or webpage_text.strip() == "":
+        logger.warning(f"Empty content extracted from webpage: {url}")
+        raise HTTPException(status_code=400, detail="Could not extract text from webpage. The page may be empty, require JavaScript, or be inaccessible.")
+
+    job.stage("splitting")
+    chunk_size, chunk_overlap = get_dynamic_chunk_size(webpage_text)
+    split_documents = split_text(
+        webpage_text,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap
+    )
+    collection_name = embed_into_new_collection(split_documents, user_id, job)
+    collection_name = publish_collection(source_key, "web", collection_name)
+    logger.info(f"Successfully created Web RAG collection: {collection_name}")
+    return collection_name
+
+# Background ingestion workers; state is persisted in the ingestion_jobs table
+job_manager = JobManager()
+job_manager.register("yt", lambda payload, user_id, job: ingest_youtube(payload["url"], user_id, job))
+job_manager.register("git", lambda payload, user_id, job: ingest_github(payload["url"], user_id, job))
+job_manager.register("pdf", lambda payload, user_id, job: ingest_pdf(payload["spool_path"], user_id, job, payload.get("sha256")))
+job_manager.register("web", lambda payload, user_id, job: ingest_web(payload["url"], user_id, job))
+job_manager.register("git_sync", lambda payload, user_id, job: sync_github(payload["chat_id"], user_id, job)["collection_name"])
+
+def queue_ingestion(user_id: int, source_type: str, payload: dict) -> JSONResponse:
+    """Queue a background ingestion and answer 202 with its job id"""
+    job_id = job_manager.enqueue(user_id, source_type, payload)
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content={"job_id": job_id, "status": "queued"})
+
 # ========== RAG ENDPOINTS ==========
 @app.post("/yt_rag")
-def create_youtube_rag(request: RAGRequest, current_user: User = Depends(get_current_user)):
-    """Create RAG vector store from YouTube video"""
+def create_youtube_rag(request: RAGRequest, background: bool = False, current_user: User = Depends(get_current_user)):
+    """Create RAG vector store from YouTube video (pass ?background=true to get a job id instead of waiting)"""
+    if background:
+        return queue_ingestion(current_user.id, "yt", {"url": request.url})
     try:
         logger.info(f"Creating YouTube RAG for user {current_user.id}, URL: {request.url}")
-        transcript = youtube_loader(request.url)
-        if not transcript or transcript.strip() == "":
-            logger.warning(f"Empty transcript extracted from YouTube URL: {request.url}")
-            raise HTTPException(status_code=400, detail="Could not extract transcript from YouTube video. Please check if the video has captions enabled.")
-        
-        chunk_size, chunk_overlap = get_dynamic_chunk_size(transcript)
-        split_documents = split_text(transcript, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-        current_millis = int(time.time() * 1000)
-        collection_name = f"{current_user.id}_{current_millis}"
-        current_dir = os.getcwd()
-        create_vector_store(split_documents, collection_name=collection_name, persist_dir=current_dir)
-        logger.info(f"Successfully created YouTube RAG collection: {collection_name}")
-        return {"collection_name": collection_name}
+        return {"collection_name": ingest_youtube(request.url, current_user.id, JobContext())}
     except HTTPException:
         raise
     except Exception as e:
@@ -1041,23 +1627,13 @@ def create_youtube_rag(request: RAGRequest, current_user: User = Depends(get_cur
         raise HTTPException(status_code=500, detail=f"Failed to process YouTube video: {error_message}")
 
 @app.post("/git_rag")
-def create_github_rag(request: RAGRequest, current_user: User = Depends(get_current_user)):
-    """Create RAG vector store from GitHub repository"""
+def create_github_rag(request: RAGRequest, background: bool = False, current_user: User = Depends(get_current_user)):
+    """Create RAG vector store from GitHub repository (pass ?background=true to get a job id instead of waiting)"""
+    if background:
+        return queue_ingestion(current_user.id, "git", {"url": request.url})
     try:
         logger.info(f"Creating Git RAG for user {current_user.id}, URL: {request.url}")
-        file_list = github_loader(request.url)
-        if not file_list or len(file_list) == 0:
-            logger.warning(f"No files found in Git repository: {request.url}")
-            raise HTTPException(status_code=400, detail="Could not access Git repository or repository is empty. Please check the URL and ensure the repository is public or accessible.")
-        
-        chunk_size, chunk_overlap = get_dynamic_chunk_size(file_list)
-        split_documents = split_text(file_list, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-        current_millis = int(time.time() * 1000)
-        collection_name = f"{current_user.id}_{current_millis}"
-        current_dir = os.getcwd()
-        create_vector_store(split_documents, collection_name=collection_name, persist_dir=current_dir)
-        logger.info(f"Successfully created Git RAG collection: {collection_name}")
-        return {"collection_name": collection_name}
+        return {"collection_name": ingest_github(request.url, current_user.id, JobContext())}
     except HTTPException:
         raise
     except Exception as e:
@@ -1069,36 +1645,46 @@ def create_github_rag(request: RAGRequest, current_user: User = Depends(get_curr
             raise HTTPException(status_code=403, detail="Cannot access private repository. Please ensure the repository is public or provide proper authentication.")
         raise HTTPException(status_code=500, detail=f"Failed to process Git repository: {error_message}")
 
+@app.post("/chats/{chat_id}/git_sync")
+def sync_github_rag(chat_id: int, background: bool = False, current_user: User = Depends(get_current_user)):
+    """Update a git_chat's repository to the latest commit, re-embedding only changed files"""
+    if background:
+        return queue_ingestion(current_user.id, "git_sync", {"chat_id": chat_id})
+    try:
+        return sync_github(chat_id, current_user.id, JobContext())
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error syncing Git RAG: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to sync Git repository: {str(e)}")
+
 @app.post("/pdf_rag")
-async def create_pdf_rag(file: UploadFile = File(...), current_user: User = Depends(get_current_user)):
-    """Create RAG vector store from PDF file"""
+async def create_pdf_rag(file: UploadFile = File(...), background: bool = False, current_user: User = Depends(get_current_user)):
+    """Create RAG vector store from PDF file (pass ?background=true to get a job id instead of waiting)"""
     temp_path = None
     try:
         if not file.filename.endswith('.pdf'):
             raise HTTPException(status_code=400, detail="Only PDF files are supported")
         
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
+        # Stream the upload to disk in blocks, hashing as we go, instead of reading it into memory.
+        # Background jobs read the upload from the spool directory so it survives a restart
+        digest = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf", dir=INGESTION_SPOOL_DIR if background else None) as tmp_file:
             temp_path = tmp_file.name
-
-        pdf_docs = list(load_pdf(temp_path))
-        if not pdf_docs:
-            raise HTTPException(status_code=400, detail="Could not load or parse PDF")
-
-        full_text = "\n".join([doc.page_content for doc in pdf_docs])
-        chunk_size, chunk_overlap = get_dynamic_chunk_size(full_text)
-        split_documents = split_text(
-            full_text,
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap
-        )
-
-        current_millis = int(time.time() * 1000)
-        collection_name = f"{current_user.id}_{current_millis}"
-        current_dir = os.getcwd()
-        create_vector_store(split_documents, collection_name=collection_name, persist_dir=current_dir)
-
+            while True:
+                block = await file.read(UPLOAD_BLOCK_BYTES)
+                if not block:
+                    break
+                digest.update(block)
+                await run_in_threadpool(tmp_file.write, block)
+        content_sha256 = digest.hexdigest()
+
+        if background:
+            response = queue_ingestion(current_user.id, "pdf", {"spool_path": temp_path, "sha256": content_sha256})
+            temp_path = None  # the job deletes the spooled file when it finishes
+            return response
+
+        collection_name = await run_in_threadpool(ingest_pdf, temp_path, current_user.id, JobContext(), content_sha256)
         return {"collection_name": collection_name}
     except HTTPException:
         raise
@@ -1112,28 +1698,13 @@ async def create_pdf_rag(file: UploadFile = File(...), current_user: User = Depe
                 pass
 
 @app.post("/web_rag")
-def create_web_rag(request: RAGRequest, current_user: User = Depends(get_current_user)):
-    """Create RAG vector store from webpage"""
+def create_web_rag(request: RAGRequest, background: bool = False, current_user: User = Depends(get_current_user)):
+    """Create RAG vector store from webpage (pass ?background=true to get a job id instead of waiting)"""
+    if background:
+        return queue_ingestion(current_user.id, "web", {"url": request.url})
     try:
         logger.info(f"Creating Web RAG for user {current_user.id}, URL: {request.url}")
-        webpage_text = web_loader(request.url)
-        if not webpage_text or webpage_text.strip() == "":
-            logger.warning(f"Empty content extracted from webpage: {request.url}")
-            raise HTTPException(status_code=400, detail="Could not extract text from webpage. The page may be empty, require JavaScript, or be inaccessible.")
-
-        chunk_size, chunk_overlap = get_dynamic_chunk_size(webpage_text)
-        split_documents = split_text(
-            webpage_text,
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap
-        )
-
-        current_millis = int(time.time() * 1000)
-        collection_name = f"{current_user.id}_{current_millis}"
-        current_dir = os.getcwd()
-        create_vector_store(split_documents, collection_name=collection_name, persist_dir=current_dir)
-        logger.info(f"Successfully created Web RAG collection: {collection_name}")
-        return {"collection_name": collection_name}
+        return {"collection_name": ingest_web(request.url, current_user.id, JobContext())}
     except HTTPException:
         raise
     except Exception as e:
@@ -1144,10 +1715,42 @@ def create_web_rag(request: RAGRequest, current_user: User = Depends(get_current
         if "timeout" in error_message.lower() or "connection" in error_message.lower():
             raise HTTPException(status_code=408, detail="Connection timeout. The webpage may be slow or inaccessible.")
         raise HTTPException(status_code=500, detail=f"Failed to process webpage: {error_message}")
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+
+# ========== INGESTION JOB ENDPOINTS ==========
+@app.get("/jobs/{job_id}")
+def get_ingestion_job(job_id: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Get status, stage, progress and ETA of a background ingestion job"""
+    job = db.query(IngestionJob).filter(IngestionJob.id == job_id, IngestionJob.user_id == current_user.id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_status(job)
+
+@app.delete("/jobs/{job_id}")
+def cancel_ingestion_job(job_id: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Cancel a queued or running ingestion job"""
+    job = db.query(IngestionJob).filter(IngestionJob.id == job_id, IngestionJob.user_id == current_user.id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job_manager.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    return {"status": "cancelled"}
+
+# ========== LIFECYCLE ==========
+@app.on_event("startup")
+async def start_background_workers():
+    """Start background ingestion workers (resuming jobs left from a previous run) and the message writer"""
+    job_manager.start()
+    if MESSAGE_WRITE_BEHIND:
+        message_writer.start()
+
+@app.on_event("shutdown")
+async def close_pooled_clients():
+    """Stop worker pools and close pooled HTTP connections held by shared clients"""
+    await message_writer.stop()
+    job_manager.shutdown()
+    shutdown_pdf_pool()
+    shutdown_hash_pool()
+    await model_registry.aclose()
 
 # ========== HOME ROUTE ==========
 @app.get("/")
@@ -1184,3 +1787,21 @@ def debug_token():
         "os_environ_status": env_vars,
         "cwd": os.getcwd()
     }
+
+@app.get("/debug/metrics")
+def debug_metrics(current_user: User = Depends(get_current_user)):
+    """Debug endpoint exposing cache and connection pool metrics; requires a logged-in user"""
+    return {
+        "llm_pool": get_llm_pool_stats(),
+        "db_pools": get_pool_stats(),
+        "message_writer": message_writer.stats(),
+        "user_cache": get_user_cache_stats(),
+        "password_hashing": get_hashing_stats(),
+        "login_throttle": get_login_throttle_stats(),
+        "memory_store": memory_store.stats(),
+        "vector_store_cache": vector_store_cache.stats(),
+        "embedding_cache": embedding_model.stats() if isinstance(embedding_model, CachedEmbeddings) else None,
+        "query_embedding_cache": query_embedding_model.stats() if query_embedding_model is not None else None,
+        "retrieval_cache": retrieval_cache.stats(),
+        "response_cache": response_cache.stats() if response_cache is not None else None,
+    }
@@ -0,0 +1,144 @@
+import os
+import time
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+from dotenv import load_dotenv
+from langchain_core.messages import SystemMessage
+
+from .context_window import ContextWindow
+
+load_dotenv()
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Memory store settings
+MEMORY_STORE_BACKEND = os.getenv("MEMORY_STORE_BACKEND", "lru")
+MEMORY_STORE_MAX_ENTRIES = int(os.getenv("MEMORY_STORE_MAX_ENTRIES", "1000"))
+MEMORY_STORE_TTL_SECONDS = float(os.getenv("MEMORY_STORE_TTL_SECONDS", "1800"))
+MEMORY_STORE_MAX_BYTES = int(os.getenv("MEMORY_STORE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+def build_memory(system_message: SystemMessage, rows) -> ContextWindow:
+    """Rebuild a chat's ContextWindow from (role, content) rows of the messages table"""
+    memory = ContextWindow(system_message)
+    for role, content in rows:
+        if role == "user":
+            memory.add_user_message(content)
+        else:
+            memory.add_ai_message(content)
+    return memory
+
+
+class MemoryStore(ABC):
+    """Interface for per-chat conversation memory caches.
+
+    The messages table is the source of truth; a store only caches the
+    rebuilt memory so that consecutive turns skip the history query.
+    """
+
+    @abstractmethod
+    def get(self, chat_id: int) -> Optional[ContextWindow]:
+        ...
+
+    @abstractmethod
+    def put(self, chat_id: int, memory: ContextWindow) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, chat_id: int) -> None:
+        ...
+
+    def stats(self) -> dict:
+        return {}
+
+
+class LRUMemoryStore(MemoryStore):
+    """In-process memory cache bounded by entry count, idle TTL and total bytes"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float, max_bytes: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        # chat_id -> (memory, size_bytes, last_access)
+        self._entries: OrderedDict[int, tuple[ContextWindow, int, float]] = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _remove(self, chat_id: int):
+        _, size, _ = self._entries.pop(chat_id)
+        self._total_bytes -= size
+
+    def _evict(self):
+        now = time.monotonic()
+        # Expired entries sit at the front because access moves entries to the end
+        while self._entries:
+            chat_id, (_, _, last_access) = next(iter(self._entries.items()))
+            if now - last_access <= self.ttl_seconds:
+                break
+            self._remove(chat_id)
+            self.evictions += 1
+        while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def get(self, chat_id: int) -> Optional[ContextWindow]:
+        with self._lock:
+            entry = self._entries.get(chat_id)
+            if entry is None or time.monotonic() - entry[2] > self.ttl_seconds:
+                if entry is not None:
+                    self._remove(chat_id)
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            memory, size, _ = entry
+            self._entries[chat_id] = (memory, size, time.monotonic())
+            self._entries.move_to_end(chat_id)
+            self.hits += 1
+            return memory
+
+    def put(self, chat_id: int, memory: ContextWindow) -> None:
+        """Insert or re-measure a chat's memory (call again after appending messages)"""
+        size = memory.size_bytes
+        with self._lock:
+            if chat_id in self._entries:
+                self._remove(chat_id)
+            self._entries[chat_id] = (memory, size, time.monotonic())
+            self._total_bytes += size
+            self._evict()
+
+    def delete(self, chat_id: int) -> None:
+        with self._lock:
+            if chat_id in self._entries:
+                self._remove(chat_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "lru",
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+def create_memory_store(backend: str = MEMORY_STORE_BACKEND) -> MemoryStore:
+    """Build the configured memory store backend"""
+    if backend == "lru":
+        return LRUMemoryStore(
+            max_entries=MEMORY_STORE_MAX_ENTRIES,
+            ttl_seconds=MEMORY_STORE_TTL_SECONDS,
+            max_bytes=MEMORY_STORE_MAX_BYTES,
+        )
+    raise ValueError(f"Unknown MEMORY_STORE_BACKEND: {backend}")
@@ -0,0 +1,176 @@
+import os
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import update
+
+from .database import AsyncSessionLocal
+from .models import Chat, Message
+
+load_dotenv()
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Message persistence settings
+# With write-behind on, assistant messages and titles are queued and written in batches by a
+# background task; off, each is written in its own short transaction when the stream ends.
+# Off by default: replies still queued when the process dies are lost.
+MESSAGE_WRITE_BEHIND = os.getenv("MESSAGE_WRITE_BEHIND", "false").lower() == "true"
+MESSAGE_WRITE_BATCH_SIZE = int(os.getenv("MESSAGE_WRITE_BATCH_SIZE", "100"))
+# Streams wait to enqueue once this many writes are pending
+MESSAGE_WRITE_QUEUE_SIZE = int(os.getenv("MESSAGE_WRITE_QUEUE_SIZE", "10000"))
+
+
+def async_session():
+    """A new short-lived async session; callers use it as a context manager"""
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async database engine is not configured")
+    return AsyncSessionLocal()
+
+
+class MessageWrite:
+    """A pending assistant message (content) or chat title (title) for one chat.
+
+    created_at is taken when the write is made, not when it is flushed, so a
+    queued reply still sorts before the user's next message.
+    """
+
+    def __init__(self, chat_id: int, content: Optional[str] = None, title: Optional[str] = None):
+        self.chat_id = chat_id
+        self.content = content
+        self.title = title
+        self.created_at = datetime.now(timezone.utc)
+
+
+async def apply_writes(writes: list[MessageWrite]):
+    """Write a batch of messages and titles in one transaction"""
+    async with async_session() as db:
+        for write in writes:
+            if write.title is not None:
+                await db.execute(update(Chat).where(Chat.id == write.chat_id).values(title=write.title))
+            else:
+                db.add(Message(chat_id=write.chat_id, role="assistant", content=write.content, created_at=write.created_at))
+        await db.commit()
+
+
+class MessageWriter:
+    """Write-behind queue for assistant messages and chat titles.
+
+    A single background task drains the queue, writing everything pending
+    (up to batch_size) in one transaction, so many concurrent streams
+    finishing together cost a handful of short transactions rather than
+    one pinned connection each. A failed batch is retried write by write
+    so one bad row (e.g. the chat was deleted mid-stream) loses only itself.
+    """
+
+    def __init__(self, batch_size: int = MESSAGE_WRITE_BATCH_SIZE, queue_size: int = MESSAGE_WRITE_QUEUE_SIZE):
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # chat id -> writes queued or being flushed, so a chat's next turn can wait for them
+        self._pending: dict[int, int] = {}
+        self._flushed: Optional[asyncio.Condition] = None
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the writer task on the running event loop"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._flushed = asyncio.Condition()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Message write-behind started (batch size {self.batch_size}, queue size {self.queue_size})")
+
+    async def submit(self, write: MessageWrite):
+        if not self.running:
+            # Write-behind disabled, or not running yet / any more: write directly rather than drop it
+            await self._flush([write])
+            return
+        self._pending[write.chat_id] = self._pending.get(write.chat_id, 0) + 1
+        await self._queue.put(write)
+
+    async def wait_for_chat(self, chat_id: int):
+        """Return once nothing is queued for a chat any more, so its stored messages are complete"""
+        if not self._pending.get(chat_id):
+            return
+        async with self._flushed:
+            await self._flushed.wait_for(lambda: not self._pending.get(chat_id))
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._flush(batch)
+            finally:
+                for write in batch:
+                    remaining = self._pending.get(write.chat_id, 1) - 1
+                    if remaining > 0:
+                        self._pending[write.chat_id] = remaining
+                    else:
+                        self._pending.pop(write.chat_id, None)
+                    self._queue.task_done()
+                async with self._flushed:
+                    self._flushed.notify_all()
+
+    async def _flush(self, batch: list[MessageWrite]):
+        try:
+            await apply_writes(batch)
+            self.written += len(batch)
+            self.batches += 1
+            return
+        except Exception as e:
+            if len(batch) == 1:
+                self.failed += 1
+                logger.warning(f"Could not save message for chat {batch[0].chat_id}: {e}")
+                return
+            logger.warning(f"Message batch of {len(batch)} failed, retrying one by one: {e}")
+        for write in batch:
+            await self._flush([write])
+
+    async def stop(self):
+        """Write everything still queued, then stop the writer task"""
+        if not self.running:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info(f"Message write-behind stopped after {self.written} writes")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": MESSAGE_WRITE_BEHIND,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+
+message_writer = MessageWriter()
+
+
+async def save_assistant_message(chat_id: int, content: str):
+    """Queue an assistant message (written directly when write-behind is off)"""
+    await message_writer.submit(MessageWrite(chat_id, content=content))
+
+
+async def save_chat_title(chat_id: int, title: str):
+    """Queue a chat title update (written directly when write-behind is off)"""
+    await message_writer.submit(MessageWrite(chat_id, title=title))
@@ -0,0 +1,90 @@
+import os
+import json
+import logging
+from typing import Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Per chat type MMR settings: candidates fetched, relevance/diversity trade-off and minimum similarity.
+# Transcripts repeat themselves, so they favour diversity; code questions usually want the closest match.
+DEFAULT_MMR_SETTINGS = {
+    "yt_chat": {"fetch_k": 50, "lambda_mult": 0.4, "score_threshold": None},
+    "pdf_chat": {"fetch_k": 30, "lambda_mult": 0.5, "score_threshold": None},
+    "web_chat": {"fetch_k": 30, "lambda_mult": 0.5, "score_threshold": None},
+    "git_chat": {"fetch_k": 20, "lambda_mult": 0.8, "score_threshold": None},
+}
+FALLBACK_MMR_SETTINGS = {"fetch_k": 20, "lambda_mult": 0.5, "score_threshold": None}
+
+
+def load_mmr_settings() -> dict:
+    """Defaults overridden per chat type by RAG_MMR_SETTINGS, e.g. '{"git_chat": {"lambda_mult": 0.9}}'"""
+    settings = {chat_type: dict(values) for chat_type, values in DEFAULT_MMR_SETTINGS.items()}
+    overrides = os.getenv("RAG_MMR_SETTINGS")
+    if overrides:
+        try:
+            for chat_type, values in json.loads(overrides).items():
+                settings.setdefault(chat_type, dict(FALLBACK_MMR_SETTINGS)).update(values)
+        except (ValueError, AttributeError) as e:
+            logger.warning(f"Ignoring invalid RAG_MMR_SETTINGS: {e}")
+    return settings
+
+
+MMR_SETTINGS = load_mmr_settings()
+
+
+def get_mmr_settings(chat_type: Optional[str]) -> dict:
+    return MMR_SETTINGS.get(chat_type, FALLBACK_MMR_SETTINGS)
+
+
+def mmr_select(
+    query_embedding,
+    candidate_embeddings,
+    k: int,
+    lambda_mult: float = 0.5,
+    score_threshold: Optional[float] = None,
+    relevance=None,
+) -> list[int]:
+    """Indices of up to k candidates chosen by maximal marginal relevance, in selection order.
+
+    Works on one normalized candidate matrix: query similarities are a
+    single matrix-vector product, and each step only multiplies the matrix
+    by the newly selected row to update every candidate's maximum
+    similarity to the selection, so a step costs O(fetch_k * dim).
+    Candidates whose cosine similarity to the query is below
+    score_threshold are never selected. `relevance` replaces the query
+    similarity in the MMR score when the candidates were ranked some other
+    way (hybrid retrieval passes normalized fused scores); the threshold
+    still applies to the cosine similarity.
+    """
+    candidates = np.asarray(candidate_embeddings, dtype=np.float32)
+    if candidates.size == 0 or k <= 0:
+        return []
+    query = np.asarray(query_embedding, dtype=np.float32)
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+    similarity = candidates @ query
+    relevance = similarity if relevance is None else np.asarray(relevance, dtype=np.float32)
+    available = np.ones(len(candidates), dtype=bool)
+    if score_threshold is not None:
+        available &= similarity >= score_threshold
+    max_similarity = np.full(len(candidates), -np.inf, dtype=np.float32)
+
+    selected = []
+    while len(selected) < k and available.any():
+        if selected:
+            scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        else:
+            scores = relevance.copy()
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, candidates @ candidates[best], out=max_similarity)
+    return selected
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -30,6 +30,11 @@ class Chat(Base):
     user = relationship("User", back_populates="chats")
     messages = relationship("Message", back_populates="chat", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Keyset pagination of a user's chat list
+        Index("ix_chats_user_created_id", "user_id", "created_at", "id"),
+    )
+
 
 class Message(Base):
     __tablename__ = "messages"
@@ -43,11 +48,37 @@ class Message(Base):
     # Relationships
     chat = relationship("Chat", back_populates="messages")
 
+    __table_args__ = (
+        # Keyset pagination of a chat's message history
+        Index("ix_messages_chat_created_id", "chat_id", "created_at", "id"),
+    )
 
 
+class IngestedSource(Base):
+    __tablename__ = "ingested_sources"
 
+    id = Column(Integer, primary_key=True, index=True)
+    source_key = Column(String, unique=True, index=True, nullable=False)  # e.g. web:<normalized url>, pdf:<sha256>, git:<repo>@<sha>
+    source_type = Column(String, nullable=False)  # yt, web, pdf, git
+    collection_name = Column(String, unique=True, index=True, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)  # chats currently using the collection
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
 
-
-
+    id = Column(String, primary_key=True, index=True)  # uuid4 hex
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    source_type = Column(String, nullable=False)  # yt, web, pdf, git
+    payload = Column(Text, nullable=False)  # JSON arguments for the ingestion handler
+    status = Column(String, nullable=False, default="queued", index=True)  # queued, running, succeeded, failed, cancelled
+    stage = Column(String, nullable=False, default="queued")  # queued, fetching, splitting, embedding, done
+    chunks_total = Column(Integer, nullable=True)
+    chunks_embedded = Column(Integer, nullable=False, default=0)
+    collection_name = Column(String, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
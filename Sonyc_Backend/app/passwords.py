@@ -0,0 +1,125 @@
+import os
+import base64
+import hashlib
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import bcrypt
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Password hashing settings
+# bcrypt cost factor for new hashes; stored hashes with another cost are rehashed on the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Processes doing bcrypt work; 0 hashes inline in the request thread
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+# Hashing requests queued or running beyond which new ones are rejected instead of waiting
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when too many hashing requests are already waiting for the pool"""
+
+
+def prehash(password: str) -> bytes:
+    """SHA-256 then base64, so bcrypt always gets a fixed-length input under its 72-byte limit"""
+    return base64.b64encode(hashlib.sha256(password.encode('utf-8')).digest())
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against its hash using direct bcrypt + SHA256 pre-hash"""
+    try:
+        return bcrypt.checkpw(prehash(plain_password), hashed_password.encode('utf-8'))
+    except Exception as e:
+        logger.error(f"Error verifying password: {e}")
+        return False
+
+
+def get_password_hash(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+    """Hash a password using direct bcrypt + SHA256 pre-hash"""
+    return bcrypt.hashpw(prehash(password), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+
+def hash_rounds(hashed_password: str) -> Optional[int]:
+    """Cost factor of a stored bcrypt hash ("$2b$12$...")"""
+    try:
+        return int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    return hash_rounds(hashed_password) != BCRYPT_ROUNDS
+
+
+def get_hash_pool(workers: int = PASSWORD_HASH_WORKERS) -> ProcessPoolExecutor:
+    """Process pool for bcrypt, created on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the server process has live threads
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            logger.info(f"Started password hashing pool with {workers} processes")
+        return _pool
+
+
+def shutdown_hash_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def run_hashing(fn, *args):
+    """Run a hashing function on the pool and wait for it, or raise PasswordHashingBusy if the queue is full.
+
+    Called from sync endpoints, so the wait blocks a threadpool thread, never
+    the event loop; the pending limit keeps a login burst from tying up
+    every one of those threads as well.
+    """
+    global _pending
+    if PASSWORD_HASH_WORKERS <= 0:
+        return fn(*args)
+    with _pending_lock:
+        if _pending >= PASSWORD_HASH_MAX_PENDING:
+            raise PasswordHashingBusy(f"{_pending} password hashing requests already pending")
+        _pending += 1
+    try:
+        return get_hash_pool().submit(fn, *args).result()
+    finally:
+        with _pending_lock:
+            _pending -= 1
+
+
+def hash_password(password: str) -> str:
+    """get_password_hash on the hashing pool"""
+    return run_hashing(get_password_hash, password, BCRYPT_ROUNDS)
+
+
+def check_password(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the hashing pool"""
+    return run_hashing(verify_password, plain_password, hashed_password)
+
+
+def get_hashing_stats() -> dict:
+    with _pending_lock:
+        pending = _pending
+    return {
+        "workers": PASSWORD_HASH_WORKERS,
+        "pending": pending,
+        "max_pending": PASSWORD_HASH_MAX_PENDING,
+        "bcrypt_rounds": BCRYPT_ROUNDS,
+    }
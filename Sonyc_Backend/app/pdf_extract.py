@@ -0,0 +1,85 @@
+import os
+import logging
+import itertools
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, Optional
+
+from dotenv import load_dotenv
+from pypdf import PdfReader
+
+load_dotenv()
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Parallel PDF extraction settings
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+# Smaller PDFs are extracted serially; process start-up and IPC would cost more than they save
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def use_parallel_extraction(total_pages: Optional[int], workers: int = PDF_EXTRACT_WORKERS) -> bool:
+    return workers > 1 and total_pages is not None and total_pages >= PDF_PARALLEL_MIN_PAGES
+
+
+def extract_page_range(path: str, start: int, end: int) -> list[str]:
+    """Text of pages [start, end) of a PDF; runs inside a pool worker"""
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() for i in range(start, min(end, len(reader.pages)))]
+
+
+def get_pdf_pool(workers: int = PDF_EXTRACT_WORKERS) -> ProcessPoolExecutor:
+    """Process pool shared by all PDF ingestions, created on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the server process has live threads (job workers, Chroma, HTTP pools)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            logger.info(f"Started PDF extraction pool with {workers} processes")
+        return _pool
+
+
+def shutdown_pdf_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def extract_pages_parallel(
+    path: str,
+    total_pages: int,
+    workers: int = PDF_EXTRACT_WORKERS,
+    pages_per_task: int = PDF_PAGES_PER_TASK,
+    pool: Optional[ProcessPoolExecutor] = None,
+) -> Iterator[str]:
+    """Yield page texts in order while page ranges are extracted across a process pool.
+
+    At most two ranges per worker are in flight, so memory stays bounded and
+    the splitter downstream can start on the first pages immediately.
+    """
+    pool = pool or get_pdf_pool(workers)
+    ranges = iter(range(0, total_pages, pages_per_task))
+    pending = deque()
+    try:
+        for start in itertools.islice(ranges, workers * 2):
+            pending.append(pool.submit(extract_page_range, path, start, start + pages_per_task))
+        while pending:
+            texts = pending.popleft().result()
+            next_start = next(ranges, None)
+            if next_start is not None:
+                pending.append(pool.submit(extract_page_range, path, next_start, next_start + pages_per_task))
+            yield from texts
+    finally:
+        # The consumer stopped early (error or cancelled job): drop work not yet started
+        for future in pending:
+            future.cancel()
+
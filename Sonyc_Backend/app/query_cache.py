@@ -0,0 +1,155 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+
+load_dotenv()
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Query-side cache settings
+QUERY_EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_EMBEDDING_CACHE_MAX_ENTRIES", "10000"))
+RETRIEVAL_CACHE_MAX_ENTRIES = int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", "10000"))
+# Bounds how long another worker's change to a collection can go unnoticed
+RETRIEVAL_CACHE_TTL_SECONDS = float(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "600"))
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Case, spacing and trailing punctuation do not change what a question retrieves"""
+    return WHITESPACE_RE.sub(" ", text).strip().rstrip("?!.").strip().lower()
+
+
+class LRUCache:
+    """Thread-safe LRU mapping with an optional TTL and hit/miss counters"""
+
+    def __init__(self, max_entries: int, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # key -> (value, stored_at)
+        self._entries: OrderedDict[Hashable, tuple[object, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds is not None and time.monotonic() - entry[1] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """Embeddings wrapper that remembers query vectors by normalized query text.
+
+    Query vectors depend only on the model and the text, so one cache serves
+    every collection. Document embedding passes straight through.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, max_entries: int = QUERY_EMBEDDING_CACHE_MAX_ENTRIES):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = LRUCache(max_entries)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        key = (self.model_name, normalize_query(text))
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> list[float]:
+        key = (self.model_name, normalize_query(text))
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            self.cache.put(key, vector)
+        return vector
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+
+class RetrievalCache:
+    """Chunk ids retrieved per (collection, query, k, mode, filter).
+
+    Each collection has a version that is bumped when it is rewritten or
+    deleted; the version is part of every key, so stale results are simply
+    never looked up again and age out of the LRU.
+    """
+
+    def __init__(self, max_entries: int = RETRIEVAL_CACHE_MAX_ENTRIES, ttl_seconds: float = RETRIEVAL_CACHE_TTL_SECONDS):
+        self.cache = LRUCache(max_entries, ttl_seconds)
+        self._versions: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.invalidations = 0
+
+    def _key(self, collection_name: str, query: str, k: int, mode: str, where: Optional[dict]) -> tuple:
+        with self._lock:
+            version = self._versions.get(collection_name, 0)
+        filter_key = json.dumps(where, sort_keys=True) if where else ""
+        return (collection_name, version, normalize_query(query), k, mode, filter_key)
+
+    def get(self, collection_name: str, query: str, k: int, mode: str, where: Optional[dict] = None) -> Optional[list[str]]:
+        return self.cache.get(self._key(collection_name, query, k, mode, where))
+
+    def put(self, collection_name: str, query: str, k: int, mode: str, ids: list[str], where: Optional[dict] = None):
+        self.cache.put(self._key(collection_name, query, k, mode, where), list(ids))
+
+    def discard(self, collection_name: str, query: str, k: int, mode: str, where: Optional[dict] = None):
+        self.cache.discard(self._key(collection_name, query, k, mode, where))
+
+    def invalidate(self, collection_name: str):
+        with self._lock:
+            self._versions[collection_name] = self._versions.get(collection_name, 0) + 1
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            invalidations = self.invalidations
+        return {**self.cache.stats(), "invalidations": invalidations}
@@ -0,0 +1,154 @@
+import os
+import math
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from .query_cache import normalize_query
+
+load_dotenv()
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Response cache settings (off unless RESPONSE_CACHE_ENABLED=true)
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+RESPONSE_CACHE_CHAT_TYPES = tuple(
+    chat_type.strip() for chat_type in os.getenv("RESPONSE_CACHE_CHAT_TYPES", "yt_chat,pdf_chat,web_chat").split(",") if chat_type.strip()
+)
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+# Cosine similarity above which a differently worded question reuses an answer; 0 disables paraphrase matching
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0"))
+# Cached answers are replayed in pieces of this many characters
+REPLAY_CHUNK_CHARS = 256
+
+
+def hash_context(texts: list[str]) -> str:
+    """Fingerprint of the retrieved context an answer was grounded on"""
+    digest = hashlib.sha256()
+    for text in texts:
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def cosine_similarity(a: list[float], b: list[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class ResponseCache:
+    """LRU + TTL cache of finished RAG answers keyed by (collection, context hash, question).
+
+    An answer is only reused when the same chunks were retrieved, so a hit
+    is grounded on exactly the context the model saw. With a similarity
+    threshold, a paraphrased question that retrieved the same context also
+    hits if its query embedding is close enough to a cached question's.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS, similarity_threshold: float = RESPONSE_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        # (collection, context_hash, question) -> (answer, query_embedding, stored_at)
+        self._entries: OrderedDict[tuple, tuple[str, Optional[list[float]], float]] = OrderedDict()
+        # (collection, context_hash) -> keys, for paraphrase lookups
+        self._buckets: dict[tuple, set] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _remove(self, key: tuple):
+        self._entries.pop(key, None)
+        bucket = self._buckets.get(key[:2])
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self._buckets[key[:2]]
+
+    def _expired(self, stored_at: float) -> bool:
+        return time.monotonic() - stored_at > self.ttl_seconds
+
+    def get(self, collection_name: str, context_hash: str, question: str, query_embedding: Optional[list[float]] = None) -> Optional[str]:
+        key = (collection_name, context_hash, normalize_query(question))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[2]):
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+            if query_embedding is not None and self.similarity_threshold > 0:
+                best_key, best_score = None, self.similarity_threshold
+                for candidate in self._buckets.get(key[:2], ()):
+                    answer, embedding, stored_at = self._entries[candidate]
+                    if embedding is None or self._expired(stored_at):
+                        continue
+                    score = cosine_similarity(query_embedding, embedding)
+                    if score >= best_score:
+                        best_key, best_score = candidate, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.similar_hits += 1
+                    return self._entries[best_key][0]
+
+            self.misses += 1
+            return None
+
+    def put(self, collection_name: str, context_hash: str, question: str, answer: str, query_embedding: Optional[list[float]] = None):
+        if not answer.strip():
+            return
+        key = (collection_name, context_hash, normalize_query(question))
+        with self._lock:
+            self._entries[key] = (answer, query_embedding, time.monotonic())
+            self._entries.move_to_end(key)
+            self._buckets.setdefault(key[:2], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, collection_name: str):
+        """Drop every answer for a collection that was rewritten or deleted"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == collection_name]:
+                self._remove(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.similar_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.hits + self.similar_hits) / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+async def replay_answer(answer: str):
+    """Stream a cached answer in the same token-stream shape as a live generation"""
+    for start in range(0, len(answer), REPLAY_CHUNK_CHARS):
+        yield answer[start:start + REPLAY_CHUNK_CHARS]
+
+
+async def record_answer(token_stream, on_complete):
+    """Pass tokens through and hand the full answer to on_complete once the stream finished normally"""
+    parts = []
+    async for token in token_stream:
+        parts.append(token)
+        yield token
+    on_complete("".join(parts))
@@ -0,0 +1,153 @@
+import os
+import logging
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+from langchain_core.documents import Document
+
+from .mmr import mmr_select, get_mmr_settings
+from .vector_cache import CachedCollection
+
+load_dotenv()
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Retrieval settings
+# "hybrid" fuses BM25 and vector rankings, "vector" is embedding-only MMR,
+# "lexical" uses BM25 alone and needs no embedding call
+RAG_RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "hybrid")
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "5"))
+# Minimum candidates taken from each ranking before fusion (the chat type's fetch_k if larger)
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+# Standard reciprocal-rank-fusion constant; damps the weight of the very top ranks
+RRF_K = 60
+
+RETRIEVAL_MODES = ("hybrid", "vector", "lexical")
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = RRF_K) -> list[tuple[str, float]]:
+    """Fuse several ranked id lists: each id scores sum(1 / (k + rank)) over the lists it appears in"""
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def fetch_documents(chroma_collection, ids: list[str], where: Optional[dict] = None) -> dict[str, Document]:
+    """Stored chunks by id (optionally restricted by a metadata filter), without any embedding call"""
+    if not ids:
+        return {}
+    rows = chroma_collection.get(ids=ids, where=where, include=["documents", "metadatas"])
+    return {
+        doc_id: Document(id=doc_id, page_content=text, metadata=metadata or {})
+        for doc_id, text, metadata in zip(rows["ids"], rows["documents"], rows["metadatas"])
+    }
+
+
+def lexical_search(collection: CachedCollection, query: str, k: int, where: Optional[dict] = None) -> list[Document]:
+    # Over-fetch when filtering, since the index itself knows nothing about metadata
+    ranked = collection.lexical_index.search(query, k * 4 if where else k)
+    ids = [doc_id for doc_id, _ in ranked]
+    found = fetch_documents(collection.vector_store._collection, ids, where)
+    return [found[doc_id] for doc_id in ids if doc_id in found][:k]
+
+
+def nearest_with_embeddings(collection: CachedCollection, query_embedding: list[float], n: int, where: Optional[dict] = None) -> tuple[list[Document], list]:
+    """The n nearest chunks and their stored vectors, in one Chroma query"""
+    rows = collection.vector_store._collection.query(
+        query_embeddings=[query_embedding], n_results=n, where=where, include=["documents", "metadatas", "embeddings"]
+    )
+    embeddings = rows["embeddings"][0]
+    if embeddings is None or len(embeddings) == 0:
+        return [], []
+    docs = [
+        Document(id=doc_id, page_content=text, metadata=metadata or {})
+        for doc_id, text, metadata in zip(rows["ids"][0], rows["documents"][0], rows["metadatas"][0])
+    ]
+    return docs, list(embeddings)
+
+
+def mmr_candidates(collection: CachedCollection, query_embedding: list[float], k: int, settings: dict, where: Optional[dict] = None) -> list[Document]:
+    """Fetch settings["fetch_k"] nearest chunks with their vectors and re-rank them with MMR"""
+    docs, embeddings = nearest_with_embeddings(collection, query_embedding, max(settings["fetch_k"], k), where)
+    if not docs:
+        return []
+    chosen = mmr_select(query_embedding, embeddings, k, settings["lambda_mult"], settings.get("score_threshold"))
+    return [docs[i] for i in chosen]
+
+
+async def mmr_search(collection: CachedCollection, query: str, k: int, embedding_model, settings: dict, where: Optional[dict] = None) -> list[Document]:
+    query_embedding = await embedding_model.aembed_query(query)
+    return await run_in_threadpool(mmr_candidates, collection, query_embedding, k, settings, where)
+
+
+def hybrid_candidates(collection: CachedCollection, query: str, query_embedding: list[float], k: int, settings: dict, where: Optional[dict] = None) -> list[Document]:
+    """Fuse the vector and BM25 rankings with RRF, then pick k of the fused candidates with MMR.
+
+    Each ranking contributes the chat type's fetch_k candidates (at least
+    HYBRID_CANDIDATES). MMR uses the normalized fused score as relevance, so
+    lexical-only matches keep their rank, and lambda_mult / score_threshold
+    apply as they do for vector retrieval. Vectors of lexical-only candidates
+    are read from the collection; nothing is embedded again.
+    """
+    n = max(settings["fetch_k"], HYBRID_CANDIDATES, k)
+    vector_docs, vector_embeddings = nearest_with_embeddings(collection, query_embedding, n, where)
+    lexical_docs = lexical_search(collection, query, n, where)
+    by_id = {doc.id: doc for doc in lexical_docs}
+    by_id.update({doc.id: doc for doc in vector_docs})
+    embeddings_by_id = {doc.id: embedding for doc, embedding in zip(vector_docs, vector_embeddings)}
+
+    fused = reciprocal_rank_fusion([[doc.id for doc in vector_docs], [doc.id for doc in lexical_docs]])
+    missing = [doc_id for doc_id, _ in fused if doc_id not in embeddings_by_id]
+    if missing:
+        rows = collection.vector_store._collection.get(ids=missing, include=["embeddings"])
+        embeddings_by_id.update(zip(rows["ids"], rows["embeddings"]))
+    fused = [(doc_id, score) for doc_id, score in fused if doc_id in embeddings_by_id]
+    if not fused:
+        return []
+
+    top_score = fused[0][1]
+    chosen = mmr_select(
+        query_embedding,
+        [embeddings_by_id[doc_id] for doc_id, _ in fused],
+        k,
+        settings["lambda_mult"],
+        settings.get("score_threshold"),
+        relevance=[score / top_score for _, score in fused],
+    )
+    return [by_id[fused[i][0]] for i in chosen]
+
+
+async def hybrid_search(collection: CachedCollection, query: str, k: int, embedding_model, settings: dict, where: Optional[dict] = None) -> list[Document]:
+    query_embedding = await embedding_model.aembed_query(query)
+    return await run_in_threadpool(hybrid_candidates, collection, query, query_embedding, k, settings, where)
+
+
+async def retrieve(
+    collection: CachedCollection,
+    query: str,
+    embedding_model,
+    mode: str = RAG_RETRIEVAL_MODE,
+    k: int = RAG_TOP_K,
+    where: Optional[dict] = None,
+    chat_type: Optional[str] = None,
+) -> list[Document]:
+    """Retrieve context chunks for a question with the requested strategy.
+
+    Vector and hybrid retrieval both finish with MMR using the chat type's
+    fetch_k / lambda_mult / score_threshold. Collections without a lexical
+    index (it failed to build, or indexing is disabled) fall back to vector
+    retrieval.
+    """
+    if mode != "vector" and collection.lexical_index is None:
+        logger.info(f"No lexical index for this collection, using vector retrieval instead of {mode}")
+        mode = "vector"
+
+    if mode == "lexical":
+        return await run_in_threadpool(lexical_search, collection, query, k, where)
+    if mode == "hybrid":
+        return await hybrid_search(collection, query, k, embedding_model, get_mmr_settings(chat_type), where)
+    return await mmr_search(collection, query, k, embedding_model, get_mmr_settings(chat_type), where)
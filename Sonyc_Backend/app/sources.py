@@ -0,0 +1,163 @@
+import hashlib
+import logging
+from typing import Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import requests
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .models import IngestedSource
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Query parameters that never change page content
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "ref", "ref_src", "si")
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a URL for deduplication"""
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or "https").lower()
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    port = parts.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    path = parts.path.rstrip("/") or "/"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    )
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+def extract_youtube_video_id(url: str) -> str:
+    """Video id from youtube.com/watch?v=... or youtu.be/... URLs"""
+    parts = urlsplit(url.strip())
+    if parts.hostname and parts.hostname.endswith("youtu.be"):
+        return parts.path.strip("/").split("/")[0]
+    for key, value in parse_qsl(parts.query):
+        if key == "v":
+            return value
+    return url.split("v=")[1].split("&")[0]
+
+
+def youtube_source_key(url: str) -> str:
+    return f"yt:{extract_youtube_video_id(url)}"
+
+
+def web_source_key(url: str) -> str:
+    return f"web:{normalize_url(url)}"
+
+
+def pdf_source_key(content_sha256: str) -> str:
+    return f"pdf:{content_sha256}"
+
+
+def git_source_key(repo_id: str, commit_sha: str) -> str:
+    return f"git:{repo_id.lower()}@{commit_sha}"
+
+
+def parse_git_source_key(source_key: str) -> Optional[tuple[str, str]]:
+    """(repo_id, commit_sha) from a git source key, or None for other source types"""
+    if not source_key.startswith("git:") or "@" not in source_key:
+        return None
+    repo_id, commit_sha = source_key[len("git:"):].rsplit("@", 1)
+    return repo_id, commit_sha
+
+
+def resolve_github_commit(repo_id: str, ref: str, token: Optional[str]) -> Optional[str]:
+    """Commit SHA a branch or tag currently points to, or None if it cannot be resolved"""
+    headers = {"Accept": "application/vnd.github.sha"}
+    if token:
+        headers["Authorization"] = f"token {token}"
+    try:
+        resp = requests.get(f"https://api.github.com/repos/{repo_id}/commits/{ref}", headers=headers, timeout=10)
+        if resp.status_code == 200:
+            return resp.text.strip()
+        logger.warning(f"Could not resolve {repo_id}@{ref}: GitHub returned {resp.status_code}")
+    except Exception as e:
+        logger.warning(f"Could not resolve {repo_id}@{ref}: {e}")
+    return None
+
+
+def sha256_file(path: str, block_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def find_source(db: Session, source_key: str) -> Optional[IngestedSource]:
+    return db.query(IngestedSource).filter(IngestedSource.source_key == source_key).first()
+
+
+def find_source_by_collection(db: Session, collection_name: str) -> Optional[IngestedSource]:
+    return db.query(IngestedSource).filter(IngestedSource.collection_name == collection_name).first()
+
+
+def register_source(db: Session, source_key: str, source_type: str, collection_name: str) -> Optional[str]:
+    """Record a freshly ingested collection, holding one reference for the chat it is ingested for.
+
+    If another request registered the source first, a reference to its
+    collection is taken instead (see acquire_source) and that collection's
+    name returned; None if its row cannot be acquired any more.
+    """
+    source = IngestedSource(source_key=source_key, source_type=source_type, collection_name=collection_name, ref_count=1)
+    db.add(source)
+    try:
+        db.commit()
+        return collection_name
+    except IntegrityError:
+        db.rollback()
+        return acquire_source(db, source_key)
+
+
+def acquire_source(db: Session, source_key: str) -> Optional[str]:
+    """Take a reference to the collection registered for a source, in one statement; returns its name.
+
+    The lookup and the increment are a single UPDATE ... RETURNING, and rows at
+    ref_count 0 are skipped: release_collection deletes a row in the same
+    transaction that takes its count to 0, so a collection on its way out is
+    never handed out again. None means there is nothing to reuse.
+    """
+    row = db.execute(
+        update(IngestedSource)
+        .where(IngestedSource.source_key == source_key, IngestedSource.ref_count > 0)
+        .values(ref_count=IngestedSource.ref_count + 1)
+        .returning(IngestedSource.collection_name)
+    ).first()
+    db.commit()
+    return row[0] if row else None
+
+
+def forget_source(db: Session, source: IngestedSource):
+    """Remove a registry row whose collection no longer exists"""
+    db.delete(source)
+    db.commit()
+
+
+def release_collection(db: Session, collection_name: str) -> Optional[bool]:
+    """Drop one chat's reference to a collection.
+
+    Returns True when the collection is no longer referenced and its registry
+    row was removed, False while other chats still use it, and None if the
+    collection was never registered (ingested before the registry existed).
+    """
+    db.execute(
+        update(IngestedSource)
+        .where(IngestedSource.collection_name == collection_name, IngestedSource.ref_count > 0)
+        .values(ref_count=IngestedSource.ref_count - 1)
+    )
+    source = db.query(IngestedSource).filter(IngestedSource.collection_name == collection_name).first()
+    if source is None:
+        return None
+    if source.ref_count > 0:
+        return False
+    db.delete(source)
+    return True
@@ -0,0 +1,129 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import chromadb
+from chromadb.config import Settings
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Vector store cache settings
+VECTOR_CACHE_MAX_ENTRIES = int(os.getenv("VECTOR_CACHE_MAX_ENTRIES", "64"))
+VECTOR_CACHE_MAX_BYTES = int(os.getenv("VECTOR_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# mistral-embed vectors are 1024 float32 values
+EMBEDDING_DIM = 1024
+BYTES_PER_VECTOR = EMBEDDING_DIM * 4
+
+_clients: dict[str, "chromadb.api.ClientAPI"] = {}
+_clients_lock = threading.Lock()
+
+
+def get_chroma_client(persist_dir: str):
+    """Shared persistent Chroma client per directory.
+
+    Chroma's own segment cache is capped at the same byte budget as our
+    handle cache, so evicting a collection here also lets Chroma unload it.
+    """
+    client = _clients.get(persist_dir)
+    if client is not None:
+        return client
+    with _clients_lock:
+        client = _clients.get(persist_dir)
+        if client is None:
+            client = chromadb.PersistentClient(
+                path=persist_dir,
+                settings=Settings(
+                    anonymized_telemetry=False,
+                    chroma_segment_cache_policy="LRU",
+                    chroma_memory_limit_bytes=VECTOR_CACHE_MAX_BYTES,
+                ),
+            )
+            _clients[persist_dir] = client
+            logger.info(f"Opened shared Chroma client at {persist_dir}")
+    return client
+
+
+class CachedCollection:
+    """An opened vector store together with the lexical index built on it"""
+
+    def __init__(self, vector_store, size_bytes: int, lexical_index=None):
+        self.vector_store = vector_store
+        self.lexical_index = lexical_index
+        self.size_bytes = size_bytes + (lexical_index.size_bytes if lexical_index is not None else 0)
+
+
+class VectorStoreCache:
+    """LRU cache of opened collections keyed by collection name.
+
+    Size is estimated from the number of stored vectors, which is what
+    dominates once Chroma has the collection's HNSW index in memory.
+    """
+
+    def __init__(self, max_entries: int = VECTOR_CACHE_MAX_ENTRIES, max_bytes: int = VECTOR_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, CachedCollection] = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, collection_name: str, open_collection: Callable[[str], CachedCollection]) -> CachedCollection:
+        """Return the cached handle, opening it with open_collection on a miss"""
+        with self._lock:
+            entry = self._entries.get(collection_name)
+            if entry is not None:
+                self._entries.move_to_end(collection_name)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # Open outside the lock so a slow disk open does not block other chats
+        entry = open_collection(collection_name)
+        with self._lock:
+            existing = self._entries.get(collection_name)
+            if existing is not None:
+                return existing
+            self._entries[collection_name] = entry
+            self._total_bytes += entry.size_bytes
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._total_bytes -= evicted.size_bytes
+                self.evictions += 1
+        return entry
+
+    def invalidate(self, collection_name: str) -> Optional[CachedCollection]:
+        """Drop a collection's handle, e.g. after it was deleted or rewritten"""
+        with self._lock:
+            entry = self._entries.pop(collection_name, None)
+            if entry is not None:
+                self._total_bytes -= entry.size_bytes
+            return entry
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "estimated_bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+def estimate_collection_bytes(vector_store) -> int:
+    """Estimated in-memory size of a collection's vectors"""
+    try:
+        return vector_store._collection.count() * BYTES_PER_VECTOR
+    except Exception:
+        return 0
@@ -0,0 +1,89 @@
+"""
+Requests/sec on an /auth/me style endpoint with and without the user cache.
+
+"lookup" loads the user from the database on every request (the old
+behaviour), "cached" goes through the TTL user cache, and "claims" trusts
+the id/email signed into the token (JWT_TRUST_CLAIMS). The database is a
+throwaway SQLite file; DB_LATENCY is added to every query to stand in for
+the round trip to Postgres.
+
+Run from Sonyc_Backend:
+    python -m benchmarks.bench_auth
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+DB_LATENCY = 0.002
+REQUESTS = 2000
+CONCURRENCY = 20
+
+db_dir = tempfile.mkdtemp(prefix="bench_auth_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+
+import httpx  # noqa: E402
+from fastapi import Depends, FastAPI  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app import auth  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.models import User  # noqa: E402
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def simulate_round_trip(conn, cursor, statement, parameters, context, executemany):
+    time.sleep(DB_LATENCY)
+
+
+def build_app(dependency):
+    app = FastAPI()
+
+    @app.get("/auth/me")
+    def me(current_user: User = Depends(dependency)):
+        return {"id": current_user.id, "email": current_user.email}
+
+    return app
+
+
+async def run(app, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def one():
+            async with semaphore:
+                response = await client.get("/auth/me", headers=headers)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(REQUESTS)))
+        return REQUESTS / (time.perf_counter() - start)
+
+
+async def main():
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        user = User(email="bench@example.com", password_hash="x")
+        db.add(user)
+        db.commit()
+        token = auth.create_access_token({"sub": str(user.id), "email": user.email})
+
+    cache = auth.user_cache or auth.LRUCache(auth.USER_CACHE_MAX_ENTRIES, ttl_seconds=60)
+    print(f"{REQUESTS} requests, concurrency {CONCURRENCY}, simulated query latency {DB_LATENCY * 1000:.0f} ms")
+    cases = (
+        ("lookup", None, False, auth.get_current_user),
+        ("cached", cache, False, auth.get_current_user),
+        ("claims", None, True, auth.get_token_user),
+    )
+    for name, user_cache, trust_claims, dependency in cases:
+        auth.user_cache = user_cache
+        auth.JWT_TRUST_CLAIMS = trust_claims
+        rps = await run(build_app(dependency), token)
+        print(f"{name:>7}: {rps:8.0f} req/s")
+    print("user cache:", cache.stats())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
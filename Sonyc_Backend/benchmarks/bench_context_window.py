@@ -0,0 +1,74 @@
+"""
+Prompt size and time-to-first-token against conversation length.
+
+"full" sends the whole history (the old ConversationBufferMemory behaviour),
+"window" sends ContextWindow.build_prompt() under CONTEXT_TOKEN_BUDGET. The
+fake server adds PROMPT_DELAY_PER_KCHAR of prefill time per 1000 request bytes.
+
+Run from Sonyc_Backend:
+    python -m benchmarks.bench_context_window
+"""
+import asyncio
+import os
+import time
+
+from benchmarks.fake_servers import start_fake_mistral
+
+TURN_LENGTHS = [10, 50, 100, 250, 500]
+WORDS_PER_MESSAGE = 150
+PROMPT_DELAY_PER_KCHAR = 0.002
+
+server, base_url = start_fake_mistral(connect_delay=0.0, first_token_delay=0.01, prompt_delay_per_kchar=PROMPT_DELAY_PER_KCHAR)
+os.environ["MISTRAL_BASE_URL"] = base_url
+os.environ.setdefault("MISTRAL_API_KEY", "bench")
+
+from langchain_core.messages import SystemMessage  # noqa: E402
+from app.context_window import ContextWindow, message_tokens  # noqa: E402
+from app.llm import get_chat_model, model_registry  # noqa: E402
+
+SYSTEM_MSG = SystemMessage(content="You are a helpful assistant.")
+
+
+def build_window(turns: int) -> ContextWindow:
+    window = ContextWindow(SYSTEM_MSG)
+    filler = " ".join(["lorem"] * WORDS_PER_MESSAGE)
+    for i in range(turns):
+        window.add_user_message(f"question {i}: {filler}")
+        window.add_ai_message(f"answer {i}: {filler}")
+    window.add_user_message("and the final question?")
+    return window
+
+
+async def ttft(messages) -> float:
+    model = get_chat_model(model="mistral-small-latest", temperature=0.3, streaming=True)
+    start = time.perf_counter()
+    async for _ in model.astream(messages):
+        return time.perf_counter() - start
+    return time.perf_counter() - start
+
+
+async def main():
+    print(f"budget {ContextWindow(SYSTEM_MSG).token_budget} tokens, ~{WORDS_PER_MESSAGE} words per message")
+    print(f"{'turns':>6} | {'full tokens':>11} | {'window tokens':>13} | {'build (us)':>10} | {'full ttft':>9} | {'window ttft':>11}")
+    print("-" * 78)
+    for turns in TURN_LENGTHS:
+        window = build_window(turns)
+        full = [SYSTEM_MSG] + window.messages
+        full_tokens = sum(message_tokens(m) for m in full)
+
+        start = time.perf_counter()
+        prompt = window.build_prompt()
+        build_us = (time.perf_counter() - start) * 1e6
+
+        full_ttft = await ttft(full)
+        window_ttft = await ttft(prompt)
+        print(
+            f"{turns:>6} | {full_tokens:>11} | {window.prompt_tokens():>13} | {build_us:>10.1f} | "
+            f"{full_ttft * 1000:>7.0f}ms | {window_ttft * 1000:>9.0f}ms"
+        )
+    await model_registry.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
+    server.shutdown()
@@ -0,0 +1,64 @@
+"""
+Repository fetch time: one file at a time vs concurrent per-file vs tarball.
+
+A local fake GitHub API serves a synthetic repository with a fixed delay per
+request. "sequential" mirrors GithubFileLoader (one contents request after
+another, joined with +=), "concurrent" is app.github_fetch's per-file
+fallback and "tarball" downloads the whole snapshot in one request.
+
+Run from Sonyc_Backend:
+    python -m benchmarks.bench_github_fetch [files]
+"""
+import sys
+import time
+import random
+
+from app.github_fetch import iter_contents_files, iter_repo_files
+from benchmarks.fake_servers import start_fake_github
+
+FILES = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+REPO = "owner/repo"
+
+
+def synthetic_repo(files: int, seed: int = 3) -> dict:
+    rng = random.Random(seed)
+    repo = {}
+    for i in range(files):
+        lines = [f"def function_{i}_{j}(value):\n    return value * {rng.randint(1, 99)}\n" for j in range(rng.randint(20, 120))]
+        repo[f"src/module_{i // 50}/file_{i}.py"] = "".join(lines)
+    repo["assets/logo.png"] = "not matched by the extension filter"
+    return repo
+
+
+def sequential(api_url: str) -> int:
+    full_text = ""
+    for i, (path, text) in enumerate(iter_contents_files(REPO, "main", None, concurrency=1, api_url=api_url), start=1):
+        full_text += f"\n\n===== FILE {i}: {path} =====\n"
+        full_text += text
+    return len(full_text)
+
+
+def concurrent(api_url: str) -> int:
+    return sum(len(text) for _, text in iter_repo_files(REPO, "main", None, mode="contents", api_url=api_url))
+
+
+def tarball(api_url: str) -> int:
+    return sum(len(text) for _, text in iter_repo_files(REPO, "main", None, mode="tarball", api_url=api_url))
+
+
+def run():
+    files = synthetic_repo(FILES)
+    server, api_url = start_fake_github(files)
+    print(f"{FILES} files, {sum(len(text) for text in files.values()) / 1024:.0f} KiB of text")
+    try:
+        for name, fn in (("sequential", sequential), ("concurrent", concurrent), ("tarball", tarball)):
+            start = time.perf_counter()
+            chars = fn(api_url)
+            elapsed = time.perf_counter() - start
+            print(f"{name:>10}: {elapsed:6.2f}s  ({chars / 1024:.0f} KiB fetched)")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    run()
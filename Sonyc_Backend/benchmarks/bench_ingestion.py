@@ -0,0 +1,95 @@
+"""
+Ingestion throughput: single add_documents call vs the batched pipeline.
+
+Embeddings come from the local fake Mistral server, which charges
+EMBEDDING_DELAY_PER_ITEM per input plus a fixed per-request latency, so
+concurrency and batch size both matter the way they do against the real API.
+
+Run from Sonyc_Backend:
+    python -m benchmarks.bench_ingestion
+"""
+import tempfile
+import time
+
+import chromadb
+import requests
+from chromadb.config import Settings
+from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.ingestion import ingest_documents
+from benchmarks.fake_servers import start_fake_mistral
+
+CHUNKS = 2000
+CHUNK_WORDS = 120
+EMBEDDING_DELAY_PER_ITEM = 0.001
+REQUEST_LATENCY = 0.08
+SEQUENTIAL_BATCH = 32  # roughly what MistralAIEmbeddings sends per request
+PIPELINE_SETTINGS = [(64, 1), (64, 4), (64, 8), (128, 8)]
+
+
+class FakeMistralEmbeddings(Embeddings):
+    """Minimal embeddings client for the fake server, batching like MistralAIEmbeddings"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.session = requests.Session()
+
+    def _embed(self, texts):
+        response = self.session.post(f"{self.base_url}/embeddings", json={"model": "mistral-embed", "input": texts})
+        response.raise_for_status()
+        return [item["embedding"] for item in response.json()["data"]]
+
+    def embed_documents(self, texts):
+        vectors = []
+        for i in range(0, len(texts), SEQUENTIAL_BATCH):
+            vectors.extend(self._embed(texts[i:i + SEQUENTIAL_BATCH]))
+        return vectors
+
+    def embed_query(self, text):
+        return self._embed([text])[0]
+
+
+def make_docs():
+    filler = " ".join(["chunk"] * CHUNK_WORDS)
+    return [Document(page_content=f"{i} {filler}") for i in range(CHUNKS)]
+
+
+def main():
+    server, base_url = start_fake_mistral(
+        connect_delay=0.0,
+        first_token_delay=0.0,
+        embedding_request_delay=REQUEST_LATENCY,
+        embedding_delay_per_item=EMBEDDING_DELAY_PER_ITEM,
+    )
+    embeddings = FakeMistralEmbeddings(base_url)
+    docs = make_docs()
+
+    with tempfile.TemporaryDirectory() as persist_dir:
+        client = chromadb.PersistentClient(path=persist_dir, settings=Settings(anonymized_telemetry=False))
+
+        start = time.perf_counter()
+        Chroma(collection_name="baseline", embedding_function=embeddings, client=client).add_documents(docs)
+        elapsed = time.perf_counter() - start
+        print(f"{'add_documents':>22}: {elapsed:6.2f}s  {CHUNKS / elapsed:7.1f} chunks/sec")
+
+        for batch_size, concurrency in PIPELINE_SETTINGS:
+            start = time.perf_counter()
+            ingest_documents(
+                (Document(page_content=d.page_content) for d in docs),
+                collection_name=f"pipeline_{batch_size}_{concurrency}",
+                client=client,
+                embedding_model=embeddings,
+                batch_size=batch_size,
+                concurrency=concurrency,
+            )
+            elapsed = time.perf_counter() - start
+            label = f"pipeline b={batch_size} c={concurrency}"
+            print(f"{label:>22}: {elapsed:6.2f}s  {CHUNKS / elapsed:7.1f} chunks/sec")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Time-to-first-token and connections opened with and without the pooled model client registry.
+
+"unpooled" builds a fresh ChatMistralAI per turn (the old behaviour), so every
+turn opens a new connection. "pooled" goes through app.llm.get_chat_model and
+reuses keep-alive connections. "title" is the non-streaming ainvoke call used
+for chat titles. The fake server charges CONNECT_DELAY per new connection to
+stand in for the TCP/TLS handshake, and counts the connections it accepts: the
+pooled cases must open no more than CONCURRENCY of them for all TURNS calls.
+
+Run from Sonyc_Backend:
+    python -m benchmarks.bench_llm_pool
+"""
+import asyncio
+import os
+import statistics
+import time
+
+from benchmarks.fake_servers import start_fake_mistral
+
+TURNS = 50
+CONCURRENCY = 5
+CONNECT_DELAY = 0.05
+
+server, base_url = start_fake_mistral(connect_delay=CONNECT_DELAY, first_token_delay=0.02, tokens=20)
+os.environ["MISTRAL_BASE_URL"] = base_url
+os.environ.setdefault("MISTRAL_API_KEY", "bench")
+
+from langchain_mistralai import ChatMistralAI  # noqa: E402
+from app.llm import get_chat_model, get_llm_pool_stats, model_registry  # noqa: E402
+
+
+def unpooled_model():
+    return ChatMistralAI(
+        model="mistral-small-latest",
+        temperature=0.3,
+        streaming=True,
+        api_key=os.environ["MISTRAL_API_KEY"],
+        endpoint=base_url,
+    )
+
+
+def pooled_model():
+    return get_chat_model(model="mistral-small-latest", temperature=0.3, streaming=True)
+
+
+def title_model():
+    return get_chat_model(model="mistral-small-latest", temperature=0.3, streaming=False)
+
+
+async def stream_turn(make_model):
+    model = make_model()
+    start = time.perf_counter()
+    ttft = None
+    async for _ in model.astream("hello"):
+        if ttft is None:
+            ttft = time.perf_counter() - start
+    return ttft
+
+
+async def invoke_turn(make_model):
+    model = make_model()
+    start = time.perf_counter()
+    await model.ainvoke("hello")
+    return time.perf_counter() - start
+
+
+async def run(turn, make_model):
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def guarded():
+        async with semaphore:
+            return await turn(make_model)
+
+    opened_before = server.connections
+    ttfts = sorted(await asyncio.gather(*(guarded() for _ in range(TURNS))))
+    return statistics.median(ttfts), ttfts[int(len(ttfts) * 0.95)], server.connections - opened_before
+
+
+async def main():
+    print(f"{TURNS} turns, concurrency {CONCURRENCY}, simulated handshake {CONNECT_DELAY * 1000:.0f} ms")
+    cases = (
+        ("unpooled", stream_turn, unpooled_model, False),
+        ("pooled", stream_turn, pooled_model, True),
+        ("title", invoke_turn, title_model, True),
+    )
+    for name, turn, make_model, pooled in cases:
+        p50, p95, opened = await run(turn, make_model)
+        print(f"{name:>9}: ttft p50 {p50 * 1000:6.1f} ms | p95 {p95 * 1000:6.1f} ms | {opened} connections opened")
+        if pooled:
+            assert opened <= CONCURRENCY, f"{name}: {opened} connections for {TURNS} calls, pool is not reusing them"
+    print("pool stats:", get_llm_pool_stats())
+    await model_registry.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
+    server.shutdown()
@@ -0,0 +1,48 @@
+"""
+MMR re-ranking cost: LangChain's maximal_marginal_relevance vs app.mmr.mmr_select.
+
+The LangChain function is what Chroma.as_retriever(search_type="mmr") ran;
+it recomputes similarities against the whole selection on every step.
+mmr_select normalizes the candidate matrix once and updates a running
+max-similarity vector. Vectors are random 1024-dim float32, like mistral-embed.
+
+Run from Sonyc_Backend:
+    python -m benchmarks.bench_mmr
+"""
+import timeit
+
+import numpy as np
+from langchain_community.vectorstores.utils import maximal_marginal_relevance
+
+from app.mmr import mmr_select
+
+K = 5
+DIM = 1024
+FETCH_KS = (20, 50, 200)
+LAMBDA_MULT = 0.5
+
+
+def run():
+    rng = np.random.default_rng(11)
+    query = rng.standard_normal(DIM).astype(np.float32)
+    for fetch_k in FETCH_KS:
+        candidates = rng.standard_normal((fetch_k, DIM)).astype(np.float32)
+        as_lists = candidates.tolist()  # Chroma hands back embeddings as Python lists
+
+        number = 200
+        langchain = timeit.timeit(
+            lambda: maximal_marginal_relevance(query, as_lists, lambda_mult=LAMBDA_MULT, k=K), number=number
+        ) / number
+        vectorized = timeit.timeit(
+            lambda: mmr_select(query, as_lists, K, LAMBDA_MULT), number=number
+        ) / number
+
+        same = maximal_marginal_relevance(query, as_lists, lambda_mult=LAMBDA_MULT, k=K) == mmr_select(query, as_lists, K, LAMBDA_MULT)
+        print(
+            f"fetch_k={fetch_k:>3}: langchain {langchain * 1000:7.3f} ms  "
+            f"vectorized {vectorized * 1000:7.3f} ms  ({langchain / vectorized:4.1f}x, same selection: {same})"
+        )
+
+
+if __name__ == "__main__":
+    run()
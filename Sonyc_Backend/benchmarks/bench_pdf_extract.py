@@ -0,0 +1,55 @@
+"""
+PDF text extraction throughput (pages/sec) against process count.
+
+The serial row is what ingest_pdf does for small files; the other rows run
+app.pdf_extract.extract_pages_parallel with a pool of that many processes.
+Pool start-up is excluded so the numbers show steady-state extraction.
+
+Run from Sonyc_Backend:
+    python -m benchmarks.bench_pdf_extract [pages]
+"""
+import os
+import sys
+import time
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from app.pdf_extract import extract_page_range, extract_pages_parallel
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+
+PAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+
+def worker_counts() -> list[int]:
+    cores = os.cpu_count() or 1
+    counts, n = [], 1
+    while n < cores:
+        counts.append(n)
+        n *= 2
+    return counts + [cores]
+
+
+def run():
+    workdir = tempfile.mkdtemp(prefix="bench_pdf_extract_")
+    path = os.path.join(workdir, "synthetic.pdf")
+    write_synthetic_pdf(path, pages=PAGES)
+    print(f"{PAGES}-page synthetic PDF, {os.path.getsize(path) / 1024 / 1024:.1f} MiB, {os.cpu_count()} cores")
+
+    start = time.perf_counter()
+    pages = extract_page_range(path, 0, PAGES)
+    elapsed = time.perf_counter() - start
+    print(f"{'serial':>10}: {len(pages) / elapsed:8.1f} pages/sec")
+
+    for workers in worker_counts():
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            # Warm the pool so process start-up is not counted
+            list(pool.map(extract_page_range, [path] * workers, [0] * workers, [1] * workers))
+            start = time.perf_counter()
+            count = sum(1 for _ in extract_pages_parallel(path, PAGES, workers=workers, pool=pool))
+            elapsed = time.perf_counter() - start
+        print(f"{workers:>4} procs: {count / elapsed:8.1f} pages/sec")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,84 @@
+"""
+Peak memory and wall time of PDF ingestion: buffered vs streaming.
+
+"buffered" reproduces the old /pdf_rag body (read the whole upload, list every
+page, join into one string, split, embed). "streaming" runs app.main.ingest_pdf,
+which extracts, splits and embeds page by page. Embeddings are a cheap
+in-process fake so the numbers reflect text handling, not the API.
+
+Run from Sonyc_Backend:
+    python -m benchmarks.bench_pdf_ingestion [pages]
+"""
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+
+PAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+workdir = tempfile.mkdtemp(prefix="bench_pdf_")
+os.chdir(workdir)
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+os.environ["EMBEDDING_CACHE_ENABLED"] = "false"
+os.environ.setdefault("MISTRAL_API_KEY", "bench")
+
+from app import main  # noqa: E402
+from app.jobs import JobContext  # noqa: E402
+from app.ingestion import ingest_documents  # noqa: E402
+from app.vector_cache import get_chroma_client  # noqa: E402
+
+
+class FakeEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [[float(len(text) % 97), 1.0, 0.5, 0.25] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+main.embedding_model = FakeEmbeddings()
+
+
+def buffered(path: str):
+    with open(path, "rb") as f:
+        content = f.read()  # what `await file.read()` held
+    pdf_docs = list(main.load_pdf(path))
+    full_text = "\n".join([doc.page_content for doc in pdf_docs])
+    chunk_size, chunk_overlap = main.get_dynamic_chunk_size(full_text)
+    chunks = main.split_text(full_text, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    docs = [Document(page_content=chunk) for chunk in chunks]
+    ingest_documents(docs, collection_name="buffered", client=get_chroma_client(os.getcwd()), embedding_model=main.embedding_model)
+    del content
+
+
+def streaming(path: str):
+    main.ingest_pdf(path, 1, JobContext())
+
+
+def measure(fn, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn(path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def run():
+    path = os.path.join(workdir, "synthetic.pdf")
+    write_synthetic_pdf(path, pages=PAGES)
+    print(f"{PAGES}-page synthetic PDF, {os.path.getsize(path) / 1024 / 1024:.1f} MiB")
+    for name, fn in (("buffered", buffered), ("streaming", streaming)):
+        elapsed, peak = measure(fn, path)
+        print(f"{name:>10}: {elapsed:6.2f}s  peak Python memory {peak / 1024 / 1024:7.1f} MiB")
+
+
+if __name__ == "__main__":
+    run()
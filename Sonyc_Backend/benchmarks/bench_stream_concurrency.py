@@ -0,0 +1,157 @@
+"""
+Concurrency benchmark for POST /chat/stream.
+
+Runs the real app under uvicorn in a background thread, against a throwaway
+SQLite database and the fake Mistral server, and opens N concurrent
+normal_chat streams, each the first message of its own chat (so the title is
+generated alongside the answer, as in production). Reports wall time,
+time-to-first-token as the client sees it, and event-loop lag on the server
+loop, measured by a probe task that sleeps LAG_INTERVAL and records how late
+it wakes up. Anything blocking the loop (sync DB calls, sync generators,
+CPU work) shows up as lag and as TTFT growing with N. The fake server's
+threads share this process (and its GIL), so absolute numbers are on the
+pessimistic side; compare them across changes rather than with production.
+
+Run from Sonyc_Backend:
+    python -m benchmarks.bench_stream_concurrency
+"""
+import asyncio
+import logging
+import os
+import socket
+import statistics
+import tempfile
+import threading
+import time
+
+from benchmarks.fake_servers import start_fake_mistral
+
+TOKENS = 50
+TOKEN_DELAY = 0.02
+FIRST_TOKEN_DELAY = 0.05
+CONCURRENCY_LEVELS = [10, 50, 100, 200]
+LAG_INTERVAL = 0.01
+
+mistral, mistral_url = start_fake_mistral(
+    connect_delay=0.0, first_token_delay=FIRST_TOKEN_DELAY, token_delay=TOKEN_DELAY, tokens=TOKENS
+)
+workdir = tempfile.mkdtemp(prefix="bench_stream_")
+os.chdir(workdir)
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+os.environ["MISTRAL_BASE_URL"] = mistral_url
+os.environ.setdefault("MISTRAL_API_KEY", "bench")
+# So the model client pool does not cap the concurrency being measured
+os.environ.setdefault("LLM_POOL_MAX_CONNECTIONS", str(max(CONCURRENCY_LEVELS)))
+
+logging.disable(logging.INFO)
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+
+from app import main  # noqa: E402
+from app.auth import create_access_token  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.models import Chat, User  # noqa: E402
+
+lag_samples: list[float] = []
+lag_tasks: set = set()
+
+
+async def probe_event_loop_lag():
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(LAG_INTERVAL)
+        lag_samples.append(time.perf_counter() - start - LAG_INTERVAL)
+
+
+async def start_lag_probe():
+    task = asyncio.create_task(probe_event_loop_lag())
+    lag_tasks.add(task)
+
+
+def start_server():
+    """Serve app.main on a free local port from a background thread; returns (server, base_url)"""
+    main.app.on_event("startup")(start_lag_probe)
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(main.app, log_level="warning", backlog=4096))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    host, port = sock.getsockname()
+    return server, f"http://{host}:{port}"
+
+
+def create_chats(count: int):
+    """A user and `count` empty chats; returns (token, chat ids)"""
+    with SessionLocal() as db:
+        user = User(email="bench@example.com", password_hash="x")
+        db.add(user)
+        db.commit()
+        chats = [Chat(user_id=user.id, title="New chat", type="normal_chat") for _ in range(count)]
+        db.add_all(chats)
+        db.commit()
+        return create_access_token({"sub": str(user.id), "email": user.email}), [chat.id for chat in chats]
+
+
+async def one_stream(client, token, chat_id):
+    start = time.perf_counter()
+    first_token = None
+    body = ""
+    async with client.stream(
+        "POST",
+        "/chat/stream",
+        json={"chat_id": chat_id, "message": "Tell me something", "chat_type": "normal_chat"},
+        headers={"Authorization": f"Bearer {token}"},
+    ) as response:
+        response.raise_for_status()
+        async for text in response.aiter_text():
+            if first_token is None and text:
+                first_token = time.perf_counter() - start
+            body += text
+    assert "Error:" not in body, body
+    return first_token
+
+
+async def run_level(base_url, token, chat_ids):
+    limits = httpx.Limits(max_connections=len(chat_ids), max_keepalive_connections=len(chat_ids))
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        lag_start = len(lag_samples)
+        start = time.perf_counter()
+        ttfts = sorted(await asyncio.gather(*(one_stream(client, token, chat_id) for chat_id in chat_ids)))
+        wall = time.perf_counter() - start
+    lags = sorted(lag_samples[lag_start:]) or [0.0]
+    return {
+        "wall": wall,
+        "ttft_p50": statistics.median(ttfts),
+        "ttft_p99": ttfts[min(len(ttfts) - 1, int(len(ttfts) * 0.99))],
+        "lag_p99": lags[min(len(lags) - 1, int(len(lags) * 0.99))],
+        "lag_max": lags[-1],
+    }
+
+
+def main_():
+    main.Base.metadata.create_all(bind=main.engine)
+    token, chat_ids = create_chats(sum(CONCURRENCY_LEVELS))
+    server, base_url = start_server()
+
+    ideal = FIRST_TOKEN_DELAY + TOKENS * TOKEN_DELAY
+    print(f"Each stream: first token after {FIRST_TOKEN_DELAY * 1000:.0f} ms, {TOKENS} tokens x {TOKEN_DELAY * 1000:.0f} ms (ideal {ideal:.2f}s)")
+    print(f"{'streams':>8} | {'wall (s)':>8} | {'ttft p50':>9} | {'ttft p99':>9} | {'lag p99':>8} | {'lag max':>8}")
+    print("-" * 65)
+    offset = 0
+    for concurrency in CONCURRENCY_LEVELS:
+        stats = asyncio.run(run_level(base_url, token, chat_ids[offset:offset + concurrency]))
+        offset += concurrency
+        print(
+            f"{concurrency:>8} | {stats['wall']:>8.2f} | "
+            f"{stats['ttft_p50'] * 1000:>7.0f}ms | {stats['ttft_p99'] * 1000:>7.0f}ms | "
+            f"{stats['lag_p99'] * 1000:>6.1f}ms | {stats['lag_max'] * 1000:>6.1f}ms"
+        )
+    server.should_exit = True
+    mistral.shutdown()
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,212 @@
+"""
+Local stand-ins for the Mistral and GitHub APIs used by the benchmarks.
+
+The Mistral server speaks just enough of the API for langchain-mistralai:
+  POST /v1/chat/completions  (SSE streaming or a single JSON body)
+  POST /v1/embeddings
+and counts the connections it accepts (server.connections) so benchmarks can
+check that pooled clients reuse them.
+The GitHub server serves one in-memory repository for app.github_fetch:
+  GET /repos/<owner>/<repo>/tarball/<ref>
+  GET /repos/<owner>/<repo>/git/trees/<ref>?recursive=1
+  GET /repos/<owner>/<repo>/contents/<path>?ref=<ref>
+New connections pay CONNECT_DELAY once, which stands in for the TCP + TLS
+handshake that a pooled client avoids on later requests.
+"""
+import io
+import json
+import random
+import tarfile
+import threading
+import time
+from urllib.parse import unquote, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeMistralHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and SSE chunks go out as small writes; without this, Nagle + delayed ACK add ~40 ms
+    disable_nagle_algorithm = True
+
+    # Tunables, overridden per server via start_fake_mistral()
+    connect_delay = 0.05
+    first_token_delay = 0.02
+    prompt_delay_per_kchar = 0.0
+    token_delay = 0.0
+    tokens = 20
+    embedding_dim = 1024
+    embedding_request_delay = 0.0
+    embedding_delay_per_item = 0.0005
+
+    def setup(self):
+        super().setup()
+        with self.server.connections_lock:
+            self.server.connections += 1
+        time.sleep(self.connect_delay)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.request_bytes = length
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, payload: dict, status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        payload = self._read_json()
+        if self.path.endswith("/chat/completions"):
+            self._chat(payload)
+        elif self.path.endswith("/embeddings"):
+            self._embeddings(payload)
+        else:
+            self._send_json({"detail": "not found"}, status=404)
+
+    def _chat(self, payload: dict):
+        model = payload.get("model", "fake")
+        # Prefill cost grows with the prompt, which is what context trimming saves
+        time.sleep(self.first_token_delay + self.prompt_delay_per_kchar * self.request_bytes / 1000)
+        if not payload.get("stream"):
+            self._send_json({
+                "id": "cmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": " ".join(["token"] * self.tokens)},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 1, "completion_tokens": self.tokens, "total_tokens": self.tokens + 1},
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i in range(self.tokens):
+            chunk = {
+                "id": "cmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "delta": {"role": "assistant", "content": f"token{i} "},
+                    "finish_reason": "stop" if i == self.tokens - 1 else None,
+                }],
+            }
+            self._send_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            if self.token_delay:
+                time.sleep(self.token_delay)
+        self._send_chunk(b"data: [DONE]\n\n")
+        self._send_chunk(b"")
+
+    def _embeddings(self, payload: dict):
+        inputs = payload.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        time.sleep(self.embedding_request_delay + self.embedding_delay_per_item * len(inputs))
+        rng = random.Random(len(inputs))
+        self._send_json({
+            "id": "embd-fake",
+            "object": "list",
+            "model": payload.get("model", "fake"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": [rng.random() for _ in range(self.embedding_dim)]}
+                for i in range(len(inputs))
+            ],
+            "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)},
+        })
+
+
+def start_fake_mistral(**tunables):
+    """Start a fake Mistral server on a free port; returns (server, base_url)"""
+    handler = type("ConfiguredFakeMistralHandler", (FakeMistralHandler,), tunables)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    server.connections = 0
+    server.connections_lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address
+    return server, f"http://{host}:{port}/v1"
+
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    # Tunables, overridden per server via start_fake_github()
+    connect_delay = 0.05
+    request_delay = 0.03
+    files: dict = {}
+    tarball: bytes = b""
+
+    def setup(self):
+        super().setup()
+        time.sleep(self.connect_delay)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, body: bytes, content_type: str, status: int = 200):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        time.sleep(self.request_delay)
+        parts = urlsplit(self.path).path.split("/")
+        # ["", "repos", owner, repo, kind, ...]
+        kind = parts[4] if len(parts) > 4 else ""
+        if kind == "tarball":
+            self._send(self.tarball, "application/x-gzip")
+        elif kind == "git" and parts[5:6] == ["trees"]:
+            tree = [{"path": path, "type": "blob", "size": len(text.encode("utf-8"))} for path, text in self.files.items()]
+            self._send(json.dumps({"tree": tree, "truncated": False}).encode("utf-8"), "application/json")
+        elif kind == "contents":
+            path = unquote("/".join(parts[5:]))
+            if path in self.files:
+                self._send(self.files[path].encode("utf-8"), "application/vnd.github.raw")
+            else:
+                self._send(b'{"message": "Not Found"}', "application/json", status=404)
+        else:
+            self._send(b'{"message": "Not Found"}', "application/json", status=404)
+
+
+def build_tarball(files: dict, prefix: str = "owner-repo-0000000") -> bytes:
+    """Gzipped tar laid out like GitHub's archive endpoint"""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for path, text in files.items():
+            data = text.encode("utf-8")
+            info = tarfile.TarInfo(f"{prefix}/{path}")
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def start_fake_github(files: dict, **tunables):
+    """Start a fake GitHub API serving `files` ({path: text}); returns (server, api_url)"""
+    tunables = {"files": files, "tarball": build_tarball(files), **tunables}
+    handler = type("ConfiguredFakeGitHubHandler", (FakeGitHubHandler,), tunables)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address
+    return server, f"http://{host}:{port}"
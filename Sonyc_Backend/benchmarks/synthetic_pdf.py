@@ -0,0 +1,61 @@
+"""
+Writes text-only PDFs of any size for the PDF benchmarks.
+
+Pages are streamed to disk one at a time, so generating a large file does not
+itself use much memory. Only the core Helvetica font is referenced, which
+every PDF reader (including pypdf) can extract text from.
+"""
+import random
+
+WORDS = (
+    "retrieval augmented generation embeds each chunk of the document and stores the vectors "
+    "so that questions about the source can be answered from the most relevant passages "
+    "performance memory throughput latency streaming pipeline batch index query context"
+).split()
+
+
+def _page_stream(page_number: int, lines_per_page: int, rng: random.Random) -> bytes:
+    lines = [f"Page {page_number}"]
+    for _ in range(lines_per_page - 1):
+        lines.append(" ".join(rng.choice(WORDS) for _ in range(12)))
+    body = ["BT", "/F1 10 Tf", "14 TL", "50 800 Td"]
+    for line in lines:
+        body.append(f"({line}) Tj T*")
+    body.append("ET")
+    return "\n".join(body).encode("latin-1")
+
+
+def write_synthetic_pdf(path: str, pages: int = 500, lines_per_page: int = 50, seed: int = 7):
+    """Write a PDF with `pages` pages of pseudo-random text to path"""
+    rng = random.Random(seed)
+    # Object numbers: 1 catalog, 2 page tree, 3 font, then (page, content) pairs
+    page_ids = [4 + 2 * i for i in range(pages)]
+    offsets = {}
+
+    with open(path, "wb") as f:
+        def write_object(obj_id: int, body: bytes):
+            offsets[obj_id] = f.tell()
+            f.write(f"{obj_id} 0 obj\n".encode("ascii") + body + b"\nendobj\n")
+
+        f.write(b"%PDF-1.4\n")
+        write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+        write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode("ascii"))
+        write_object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+        for i, page_id in enumerate(page_ids):
+            content_id = page_id + 1
+            write_object(
+                page_id,
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>".encode("ascii"),
+            )
+            stream = _page_stream(i + 1, lines_per_page, rng)
+            write_object(content_id, f"<< /Length {len(stream)} >>\nstream\n".encode("ascii") + stream + b"\nendstream")
+
+        xref_offset = f.tell()
+        count = 3 + 2 * pages + 1
+        f.write(f"xref\n0 {count}\n".encode("ascii"))
+        f.write(b"0000000000 65535 f \n")
+        for obj_id in range(1, count):
+            f.write(f"{offsets[obj_id]:010d} 00000 n \n".encode("ascii"))
+        f.write(f"trailer\n<< /Size {count} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode("ascii"))